@@ -35,14 +35,62 @@ def create_app(config_class=None):
         app.config.from_object(DevelopmentConfig)  # Default to local dev settings
 
     # 2) Initialize extensions
+    from .services import flag_crypto
+    flag_crypto.init_app(app)  # Flag digest/encryption keys, needed before any Flag is written
+
+    from .services.sqlite_profile import configure_sqlite, install_pragmas
+    configure_sqlite(app)  # WAL, pragmas and pool sizing for SQLite (SQLITE_PROFILE)
     db.init_app(app)
+    with app.app_context():
+        install_pragmas(app, db.engine)
     migrate.init_app(app, db)
-    socketio.init_app(app)
+    from .services.cluster import init_socketio
+    init_socketio(app)  # Attaches a message queue when SOCKETIO_MESSAGE_QUEUE is set
+
+    from .services import rounds
+    rounds.init_app(app)
+
+    from .services import alert_events
+    alert_events.init_app(app)
+
+    from .services.flag_cache import flag_cache
+    flag_cache.init_app(app)
+
+    from .services.submission_queue import submission_queue
+    submission_queue.init_app(app)
+
+    from .services.scoreboard import scoreboard
+    scoreboard.init_app(app)
+
+    from .services.rate_limit import submit_limiter
+    submit_limiter.init_app(app)
+
+    from .services import analytics
+    analytics.init_app(app)
+
+    from .services.metrics import metrics
+    metrics.init_app(app)
+
+    from .services.challenge_jobs import challenge_jobs
+    challenge_jobs.init_app(app)
+
+    from .services.warm_pool import warm_pool
+    warm_pool.init_app(app)
+
+    from .services.render_cache import alert_table_cache
+    alert_table_cache.init_app(app)
+
+    from .services.challenge_gc import challenge_gc
+    challenge_gc.init_app(app)
 
     # 3) Register blueprints (modular routes)
     from .routes.alerts import bp as alerts_bp
     from .routes.ctf import bp as ctf_bp
+    from .routes.metrics import bp as metrics_bp
+    from .routes.analytics import bp as analytics_bp
     app.register_blueprint(alerts_bp)
     app.register_blueprint(ctf_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(analytics_bp)
 
     return app
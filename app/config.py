@@ -6,16 +6,128 @@ import os
 # `basedir` points to the directory where this file is located
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# --- SQLite storage profiles ---
+# Selected with SQLITE_PROFILE; only applied when the database URI is SQLite.
+# "pragmas" run on every new connection, "engine_options" go to create_engine().
+SQLITE_PROFILES = {
+    # Plain SQLite defaults (rollback journal, FULL sync, default pool)
+    'default': {
+        'pragmas': {},
+        'engine_options': {},
+    },
+    # Tuned for many concurrent players on one eventlet worker
+    'production': {
+        'pragmas': {
+            'journal_mode': 'WAL',       # Readers never block the writer (and vice versa)
+            'synchronous': 'NORMAL',     # Safe with WAL; skips an fsync per commit
+            'busy_timeout': 5000,        # Wait up to 5s for the write lock instead of failing
+            'mmap_size': 268435456,      # Memory-map up to 256 MB of the DB file
+            'cache_size': -65536,        # 64 MB page cache (negative = KiB)
+            'temp_store': 'MEMORY',
+        },
+        'engine_options': {
+            'pool_size': 10,             # Green threads share a small set of connections
+            'max_overflow': 20,
+            'pool_timeout': 10,
+            # Pooled connections are handed between green threads
+            'connect_args': {'check_same_thread': False, 'timeout': 5},
+        },
+    },
+}
+
+# Fallback SECRET_KEY. It is public, so flag_crypto refuses it outside DEBUG/TESTING.
+DEFAULT_SECRET_KEY = 'a-secure-production-secret-key'
+
 class Config:
     """
     Base configuration shared by all environments.
     """
     # Secret key for session management, CSRF protection, etc.
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-secure-production-secret-key'
+    SECRET_KEY = os.environ.get('SECRET_KEY') or DEFAULT_SECRET_KEY
+
+    # Key for flag digests and flag encryption at rest (None = derive from SECRET_KEY).
+    # Changing it makes existing flags unreadable, so set it once per deployment.
+    FLAG_SECRET_KEY = os.environ.get('FLAG_SECRET_KEY')
 
     # Disable SQLAlchemy event system to improve performance
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite storage profile (see SQLITE_PROFILES above)
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE') or 'production'
+
+    # Where challenge folders are written (None = ~/Desktop/CyberHunt or generated_challenges/)
+    CHALLENGE_BASE_DIR = os.environ.get('CHALLENGE_BASE_DIR')
+
+    # Hardlink identical challenge files from a shared content-addressed store
+    CHALLENGE_DEDUP_ENABLED = True
+
+    # Shape of generated challenge trees (see services/tree_gen.py; defaults = 5 folders x 3 files)
+    CHALLENGE_TREE_DEPTH = 1             # Folder levels
+    CHALLENGE_TREE_FANOUT = 5            # Subfolders per folder
+    CHALLENGE_TREE_FILES_PER_DIR = 3
+    CHALLENGE_TREE_DECOYS = 0            # Files holding a fake flag
+    CHALLENGE_FILE_MIN_BYTES = 0         # File size range (0 max = three filler lines per file)
+    CHALLENGE_FILE_MAX_BYTES = 0
+    # Writer threads for trees of at least CHALLENGE_WRITE_POOL_MIN_FILES files. 1 writes inline, which
+    # benchmarks/bench_tree.py measures as fastest; under eventlet builds always write inline in an OS thread.
+    CHALLENGE_WRITE_THREADS = 1
+    CHALLENGE_WRITE_POOL_MIN_FILES = 1000
+
+    # Challenge folders are built by background green threads, not inside the request
+    CHALLENGE_JOBS_ASYNC = True
+    CHALLENGE_JOB_WORKERS = 4            # Trees built concurrently
+    CHALLENGE_JOB_STATUS_LIMIT = 10000   # Per-alert job statuses remembered
+
+    # Unpublished, fully built alerts kept ready for round start / respawn (0 = off)
+    WARM_POOL_SIZE = 10
+
+    # Background cleanup of challenge folders (orphaned trees, disk/inode budget)
+    CHALLENGE_GC_ENABLED = True
+    CHALLENGE_GC_INTERVAL = 300        # Seconds between collection passes
+    CHALLENGE_GC_SLICE = 50            # Folders handled before yielding to requests
+    CHALLENGE_GC_DRY_RUN = False       # Only report what would be removed
+    CHALLENGE_GC_MAX_BYTES = None      # Disk budget for alert trees (None = unlimited)
+    CHALLENGE_GC_MAX_INODES = None     # Inode budget for alert trees (None = unlimited)
+
+    # Socket.IO message queue shared by all worker processes (None = single process).
+    # redis://, amqp://, kafka:// and zmq+tcp:// use that service; unix:///some/dir
+    # uses the built-in local broker (all workers on one host, no extra services).
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = 'ctf-dashboard'
+
+    # Request/SQL/challenge-build instrumentation served at /metrics
+    METRICS_ENABLED = True
+
+    # Cache of the rendered dashboard alert table, keyed by alert-set version
+    DASHBOARD_CACHE_ENABLED = True
+    DASHBOARD_CACHE_VERSIONS = 8     # Versions kept (older ones are evicted first)
+
+    # Max number of alert flags kept in the in-process verification cache
+    FLAG_CACHE_SIZE = 1024
+
+    # Write-behind batching for wrong-guess Submission rows
+    SUBMISSION_BATCH_SIZE = 100      # Flush once this many rows are queued
+    SUBMISSION_FLUSH_INTERVAL = 1.0  # ...or after this many seconds
+    SUBMISSION_MAX_RETRIES = 3       # Failed flushes before rows are retried singly and bad ones dropped
+    SUBMISSION_MAX_PENDING = 10000   # Rows kept waiting at most (oldest dropped beyond that)
+
+    # Token-bucket limits for POST /submit_flag (tokens per second / burst size)
+    SUBMIT_RATE_LIMIT_ENABLED = True
+    SUBMIT_RATE_PER_CLIENT = 5        # Guesses per second from one client address
+    SUBMIT_BURST_PER_CLIENT = 10
+    SUBMIT_RATE_PER_ALERT = 20        # Guesses per second against one alert, all clients combined
+    SUBMIT_BURST_PER_ALERT = 40
+    SUBMIT_RATE_IDLE_TTL = 300        # Seconds before an idle bucket is forgotten
+    SUBMIT_RATE_MAX_BUCKETS = 10000   # Hard cap on tracked buckets per limiter
+
+    # Per-minute submission rollups behind /analytics/rollups (rebuild with `flask backfill-rollups`)
+    ANALYTICS_ROLLUPS_ENABLED = True
+
+    # POST /submit_flag/batch
+    SUBMIT_BATCH_MAX_ITEMS = 500          # Items accepted in one request
+    SUBMIT_BATCH_RATE_PER_CLIENT = 50     # Items per second from one client address
+    SUBMIT_BATCH_BURST_PER_CLIENT = 200
+
 class DevelopmentConfig(Config):
     """
     Development configuration.
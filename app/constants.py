@@ -29,3 +29,7 @@ random_lines = [
 # --- Configurable maximum alerts setting ---
 # How many alerts are generated when the CTF is first started
 MAX_ALERTS_ON_START = 5
+
+# --- Scoreboard size ---
+# How many top players are returned by /scoreboard and pushed over Socket.IO
+SCOREBOARD_SIZE = 10
@@ -6,16 +6,44 @@ from datetime import datetime
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 from . import db
+from .services import flag_crypto
 
 # --- Helper function ---
 def generate_uuid():
     """Generate a random UUID string."""
     return str(uuid.uuid4())
 
+# --- Round Model ---
+class Round(db.Model):
+    """
+    One CTF round of an event (e.g. a class). Alerts, flags and submissions belong
+    to a round; resetting an event ends its current round and starts a new one,
+    leaving the old rows in place as an archive.
+    """
+    __tablename__ = 'rounds'
+    __table_args__ = (
+        db.Index('ix_rounds_event_ended_at', 'event', 'ended_at'),  # Current-round lookup
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    event = db.Column(db.String(64), nullable=False, default='default')  # Which class/event runs this round
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    ended_at = db.Column(db.DateTime, nullable=True)  # Set when the event is reset; NULL for the current round
+    version = db.Column(db.Integer, nullable=False, default=0)  # Last alert-set version published for this round
+
+    def __repr__(self):
+        """For easy debugging: shows round id and event."""
+        return f"<Round {self.id} [{self.event}]>"
+
 # --- Alert Model ---
 class Alert(db.Model):
     """Represents a live alert/challenge in the CTF dashboard."""
     __tablename__ = 'alerts'
+    __table_args__ = (
+        db.Index('ix_alerts_time_created_uuid', 'time_created', 'uuid'),  # Keyset pagination order
+        db.Index('ix_alerts_round_time_created_uuid', 'round_id', 'time_created', 'uuid'),  # ...within a round
+        db.Index('ix_alerts_round_active', 'round_id', 'solved_at', 'published'),  # Alert.active(round_id)
+    )
 
     uuid = db.Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
     event_id = db.Column(db.String(10), nullable=False)  # Event code like 4624, 4625
@@ -24,6 +52,9 @@ class Alert(db.Model):
     location = db.Column(db.String(128), nullable=False) # Location or geolocation
     event_type = db.Column(db.String(32), nullable=False) # Human readable type ("Failed Login", etc.)
     time_created = db.Column(db.DateTime, default=datetime.utcnow) # Timestamp when created
+    solved_at = db.Column(db.DateTime, nullable=True, index=True)  # Set on first correct submission; NULL while active
+    published = db.Column(db.Boolean, nullable=False, default=True, index=True)  # False while waiting in the warm pool
+    round_id = db.Column(db.Integer, db.ForeignKey('rounds.id'), nullable=True)  # NULL while in the warm pool
 
     # --- Relationships ---
     flag = db.relationship('Flag', backref='alert', uselist=False, cascade='all, delete-orphan')
@@ -38,26 +69,77 @@ class Alert(db.Model):
         """Nicely formatted alert description shown on the dashboard."""
         return f"{self.event_type} alert for {self.user} from {self.ip}"
 
+    @property
+    def is_active(self):
+        """True once published, until the alert has been solved by a correct submission."""
+        return self.published and self.solved_at is None
+
+    @classmethod
+    def active(cls, round_id=None):
+        """
+        Query for all active (published, unsolved) alerts of a round (None = every round).
+        Uses the indexed `solved_at` column, so cost tracks the number of
+        active alerts instead of the size of the submissions table.
+        """
+        query = cls.query.filter(cls.solved_at.is_(None), cls.published.is_(True))
+        if round_id is not None:
+            query = query.filter(cls.round_id == round_id)
+        return query
+
+    @classmethod
+    def in_round(cls, round_id):
+        """
+        Query for the published alerts (solved or not) of one round: the only
+        ones a player of that round may look up. Warm-pool alerts and alerts
+        of other events or ended rounds are excluded.
+        """
+        return cls.query.filter(cls.round_id == round_id, cls.published.is_(True))
+
 # --- Flag Model ---
 class Flag(db.Model):
-    """Represents the secret 'flag' answer tied to each alert."""
+    """
+    Represents the secret 'flag' answer tied to each alert.
+    The plaintext is only stored encrypted; submissions are matched against
+    the keyed digest (see services/flag_crypto.py).
+    """
     __tablename__ = 'flags'
+    __table_args__ = (
+        db.Index('ix_flags_digest_round', 'digest', 'round_id'),  # Flag-only submission lookup
+    )
 
     uuid = db.Column(UUID(as_uuid=False), db.ForeignKey('alerts.uuid'), primary_key=True)
-    value = db.Column(db.String(128), nullable=False) # Actual FLAG{value} string
+    round_id = db.Column(db.Integer, db.ForeignKey('rounds.id'), nullable=True, index=True)  # Same as the alert's
+    digest = db.Column(db.String(64), nullable=False)             # HMAC-SHA256 of the FLAG{...} string
+    value_encrypted = db.Column(db.String(256), nullable=False)   # FLAG{...} string, encrypted at rest
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    @property
+    def value(self):
+        """Decrypted FLAG{...} string."""
+        return flag_crypto.decrypt_flag(self.value_encrypted)
+
+    @value.setter
+    def value(self, plaintext):
+        self.digest = flag_crypto.flag_digest(plaintext)
+        self.value_encrypted = flag_crypto.encrypt_flag(plaintext)
+
     def __repr__(self):
-        """For easy debugging: shows UUID and flag value."""
-        return f"<Flag {self.uuid}={self.value}>"
+        """For easy debugging: shows UUID and the start of the flag digest."""
+        return f"<Flag {self.uuid} digest={self.digest[:12]}>"
 
 # --- Submission Model ---
 class Submission(db.Model):
     """Represents a user's attempt to submit a flag."""
     __tablename__ = 'submissions'
+    __table_args__ = (
+        db.Index('ix_submissions_alert_uuid_completed', 'alert_uuid', 'completed'),
+        db.Index('ix_submissions_round_completed_player', 'round_id', 'completed', 'player'),  # Per-round scoreboard
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     alert_uuid = db.Column(UUID(as_uuid=False), db.ForeignKey('alerts.uuid'), nullable=False)
+    round_id = db.Column(db.Integer, db.ForeignKey('rounds.id'), nullable=True)
+    player = db.Column(db.String(64), nullable=False, default='anonymous', index=True)  # Who submitted (name or client address)
     submitted_value = db.Column(db.String(128), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     score = db.Column(db.Integer, nullable=False)
@@ -67,3 +149,58 @@ class Submission(db.Model):
         """For easy debugging: shows submission ID, status (✓ or ✗), and score."""
         status = '✓' if self.completed else '✗'
         return f"<Submission {self.id} {status} score={self.score}>"
+
+# --- AlertSetVersion Model ---
+class AlertSetVersion(db.Model):
+    """
+    Single-row counter bumped on every change to the set of live alerts.
+    Kept in the database so every worker process allocates from the same sequence.
+    """
+    __tablename__ = 'alert_set_version'
+
+    id = db.Column(db.Integer, primary_key=True)  # Always 1
+    version = db.Column(db.Integer, nullable=False, default=0)
+    epoch = db.Column(db.String(16), nullable=False, default=lambda: uuid.uuid4().hex[:8])  # Changes if the DB is recreated
+
+    def __repr__(self):
+        """For easy debugging: shows the current version."""
+        return f"<AlertSetVersion {self.epoch}-{self.version}>"
+
+# --- Submission rollup Models ---
+class EventTypeRollup(db.Model):
+    """
+    Per-minute submission counters for one event type in one round.
+    Maintained incrementally as submissions are written (see services/analytics.py),
+    so charts never scan the submissions table.
+    """
+    __tablename__ = 'event_type_rollups'
+
+    round_id = db.Column(db.Integer, db.ForeignKey('rounds.id'), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)               # Start of the minute (UTC)
+    event_type = db.Column(db.String(32), primary_key=True)         # Key of event_difficulty
+    attempts = db.Column(db.Integer, nullable=False, default=0)     # All submissions, right and wrong
+    solves = db.Column(db.Integer, nullable=False, default=0)       # Correct submissions
+    elapsed_total = db.Column(db.Float, nullable=False, default=0.0)  # Sum of solve times (seconds since the flag went live)
+
+    def __repr__(self):
+        """For easy debugging: shows the bucket and its counters."""
+        return f"<EventTypeRollup {self.round_id}/{self.event_type} {self.bucket} {self.solves}/{self.attempts}>"
+
+class AlertRollup(db.Model):
+    """Per-minute submission counters for one alert (same counters as EventTypeRollup)."""
+    __tablename__ = 'alert_rollups'
+    __table_args__ = (
+        db.Index('ix_alert_rollups_round_bucket', 'round_id', 'bucket'),  # Range queries over a round
+    )
+
+    alert_uuid = db.Column(UUID(as_uuid=False), db.ForeignKey('alerts.uuid'), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    round_id = db.Column(db.Integer, db.ForeignKey('rounds.id'), nullable=True)
+    event_type = db.Column(db.String(32), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    solves = db.Column(db.Integer, nullable=False, default=0)
+    elapsed_total = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        """For easy debugging: shows the bucket and its counters."""
+        return f"<AlertRollup {self.alert_uuid} {self.bucket} {self.solves}/{self.attempts}>"
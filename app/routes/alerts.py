@@ -4,54 +4,152 @@ Alerts Blueprint: Manage alert creation, listing, and re-triggering challenge fo
 Handles REST API endpoints for the CTF dashboard backend.
 """
 
-from flask import Blueprint, request, jsonify, current_app, render_template
-from .. import db, socketio
-from ..models import Alert, Submission
-from ..services.ctf_service import generate_random_alert, create_fake_flag_challenge
+import base64
+import json
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app, render_template, Response, stream_with_context
+from sqlalchemy import and_, or_
+from .. import db
+from ..models import Alert
+from ..services.ctf_service import iter_challenge_files, alert_tree
+from ..services.bundle import BUNDLE_FORMATS, DEFAULT_BUNDLE_FORMAT, stream_bundle
+from ..services.challenge_gc import challenge_gc
+from ..services.challenge_jobs import build_challenge, challenge_jobs
+from ..services.warm_pool import warm_pool
+from ..services.rounds import current_round_id, event_of, room
+from ..services.manifest import has_manifest
+from ..services.alert_events import publish_alert_delta, active_alerts_snapshot, version_tag
 from app.constants import MAX_ALERTS_ON_START
 
 # Create a Blueprint instance for alert-related APIs
 bp = Blueprint('alerts', __name__, url_prefix='/alerts')
 
+# Default and maximum page size for GET /alerts/list
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows fetched per query while streaming NDJSON exports
+STREAM_CHUNK_SIZE = 500
+
+def _serialize_alert(a):
+    """Convert an Alert into the JSON-friendly dict used by the list API."""
+    return {
+        'uuid': a.uuid,
+        'event_id': a.event_id,
+        'user': a.user,
+        'ip': a.ip,
+        'location': a.location,
+        'event_type': a.event_type,
+        'time_created': a.time_created.isoformat()
+    }
+
+def _encode_cursor(alert):
+    """Opaque keyset cursor pointing just after `alert` in (time_created, uuid) order."""
+    raw = f"{alert.time_created.isoformat()}|{alert.uuid}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor(). Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        time_str, alert_uuid = raw.split('|', 1)
+        return datetime.fromisoformat(time_str), alert_uuid
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _alert_page(round_id, after, limit):
+    """Fetch up to `limit` of a round's alerts ordered by (time_created, uuid), starting after the `after` key."""
+    query = (Alert.query.filter(Alert.round_id == round_id, Alert.published.is_(True))
+             .order_by(Alert.time_created, Alert.uuid))
+    if after:
+        after_time, after_uuid = after
+        query = query.filter(or_(
+            Alert.time_created > after_time,
+            and_(Alert.time_created == after_time, Alert.uuid > after_uuid)
+        ))
+    return query.limit(limit).all()
+
+def _stream_alerts_ndjson(round_id, after):
+    """Yield every alert after `after` as one JSON line, fetching STREAM_CHUNK_SIZE rows at a time."""
+    while True:
+        page = _alert_page(round_id, after, STREAM_CHUNK_SIZE)
+        for a in page:
+            yield json.dumps(_serialize_alert(a)) + "\n"
+        if len(page) < STREAM_CHUNK_SIZE:
+            return
+        last = page[-1]
+        after = (last.time_created, last.uuid)
+        db.session.expunge_all()  # Keep memory flat: drop rows already written out
+
 @bp.route('/list', methods=['GET'])
 def list_alerts():
     """
     GET /alerts/list
-    Return a JSON list of all alerts stored in the database.
-    """
-    alerts = Alert.query.all()
-    alert_list = []
-    for a in alerts:
-        alert_list.append({
-            'uuid': a.uuid,
-            'event_id': a.event_id,
-            'user': a.user,
-            'ip': a.ip,
-            'location': a.location,
-            'event_type': a.event_type,
-            'time_created': a.time_created.isoformat()  # <-- fixed (removed extra parentheses)
-        })
-    return jsonify(alert_list), 200
+    Return a JSON list of the current round's alerts, oldest first.
+
+    Query params:
+        limit:  page size (default DEFAULT_PAGE_SIZE, max MAX_PAGE_SIZE)
+        after:  cursor from a previous page's X-Next-Cursor header
+        format: "ndjson" to stream every alert (after the cursor) as newline-delimited JSON
+
+    Responses carry an ETag tied to the alert-set version, so a matching
+    If-None-Match returns 304 Not Modified without touching the database.
+    """
+    cursor = request.args.get('after')
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # --- Conditional request: nothing changed since the client's copy ---
+    round_id = current_round_id()
+    ndjson = request.args.get('format') == 'ndjson'
+    etag = f"alerts-{version_tag(round_id)}-{cursor or ''}-{'ndjson' if ndjson else limit}"
+    if etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+    # --- Streamed export (never builds the whole body in memory) ---
+    if ndjson:
+        response = Response(stream_with_context(_stream_alerts_ndjson(round_id, after)), mimetype='application/x-ndjson')
+        response.set_etag(etag)
+        return response
+
+    # --- Single keyset page ---
+    page = _alert_page(round_id, after, limit)
+    response = jsonify([_serialize_alert(a) for a in page])
+    response.set_etag(etag)
+    if len(page) == limit:
+        response.headers['X-Next-Cursor'] = _encode_cursor(page[-1])
+    return response, 200
+
+@bp.route('/active', methods=['GET'])
+def active_alerts():
+    """
+    GET /alerts/active
+    Full dashboard resync: current alert-set version plus every active alert row.
+    Clients call this when they detect a gap in 'alerts_delta' versions.
+    """
+    return jsonify(active_alerts_snapshot()), 200
 
 @bp.route('/create', methods=['POST'])
 def create_alert():
     """
     POST /alerts/create
-    Create a new random alert and its associated files, 
+    Create a new random alert and its associated files in the current round,
     only if fewer than MAX_ALERTS_ON_START active alerts exist.
     """
-    # Count how many active alerts exist (no completed submissions linked)
-    active_alerts_count = Alert.query.outerjoin(Submission) \
-                          .filter((Submission.completed == False) | (Submission.id == None)) \
-                          .count()
+    # Count how many active alerts exist (not yet solved)
+    round_id = current_round_id()
+    active_alerts_count = Alert.active(round_id).count()
 
     if active_alerts_count >= MAX_ALERTS_ON_START:
         # Already too many active challenges
         return jsonify({'message': 'Maximum number of active alerts reached.'}), 400
 
     # Create a new random alert and push it to users via Socket.IO
-    new_uuid = generate_random_alert()
-    socketio.emit('new_alert', {'uuid': new_uuid})
+    new_uuid = warm_pool.publish(1, round_id)[0]
+    publish_alert_delta(added=[new_uuid], round_id=round_id)
     return jsonify({'uuid': new_uuid}), 201
 
 @bp.route('/<string:alert_uuid>/trigger', methods=['POST'])
@@ -60,8 +158,9 @@ def trigger_alert(alert_uuid):
     POST /alerts/<uuid>/trigger
     Rebuild the challenge folder/files for a specific existing alert.
     Useful if hint files were deleted and need to be recreated without changing DB.
+    404 unless the alert is published in the session's current round.
     """
-    alert = Alert.query.get_or_404(alert_uuid)  # Safely lookup alert or 404 if not found
+    alert = Alert.in_round(current_round_id()).filter_by(uuid=alert_uuid).first_or_404()
 
     alert_data = {
         'uuid': alert.uuid,
@@ -71,7 +170,76 @@ def trigger_alert(alert_uuid):
         'time': alert.time_created.isoformat()
     }
 
-    create_fake_flag_challenge(alert_data, alert_uuid)  # Recreate challenge files
-    current_app.logger.info(f"Re-triggered CTF folder for alert {alert_uuid}")
+    tree = alert_tree(alert.uuid, alert.round_id)
+    result = build_challenge(alert_data, alert.uuid, tree=tree)  # Rewrite only missing/changed files
+    challenge_jobs.mark_ready(alert.uuid, room=room(event_of(alert.round_id)))
+    current_app.logger.info(
+        f"Re-triggered CTF folder for alert {alert_uuid}: "
+        f"{result['written']} written, {result['unchanged']} unchanged"
+    )
 
     return ('', 204)  # Respond with 204 No Content
+
+@bp.route('/<string:alert_uuid>/status', methods=['GET'])
+def alert_status(alert_uuid):
+    """
+    GET /alerts/<uuid>/status
+    Challenge folder build status: pending, ready or failed.
+    Builds this worker has no record of are reported from the folder's manifest
+    ('ready' if one exists, otherwise 'missing').
+    404 unless the alert is published in the session's current round.
+    """
+    alert = Alert.in_round(current_round_id()).filter_by(uuid=alert_uuid).first_or_404()
+    job = challenge_jobs.status(alert.uuid)
+    if job is None:
+        built = has_manifest(alert_tree(alert.uuid, alert.round_id))
+        job = {'uuid': alert.uuid, 'status': 'ready' if built else 'missing'}
+    return jsonify(job), 200
+
+@bp.route('/jobs', methods=['GET'])
+def job_stats():
+    """
+    GET /alerts/jobs
+    Challenge build pool settings and counters, plus warm pool hits/misses.
+    """
+    return jsonify(dict(challenge_jobs.stats(), warm_pool=warm_pool.stats())), 200
+
+@bp.route('/<string:alert_uuid>/bundle', methods=['GET'])
+def download_bundle(alert_uuid):
+    """
+    GET /alerts/<uuid>/bundle?format=tar|tar.gz|zip
+    Stream the alert's challenge tree as an archive, generated in memory
+    chunk by chunk (nothing is written to the server's disk). Tar (the
+    default) takes constant memory; zip holds a small record per file.
+    404 unless the alert is published in the session's current round.
+    """
+    fmt = request.args.get('format', DEFAULT_BUNDLE_FORMAT)
+    if fmt not in BUNDLE_FORMATS:
+        return jsonify({'message': f"Unknown format '{fmt}', use one of: {', '.join(BUNDLE_FORMATS)}"}), 400
+
+    alert = Alert.in_round(current_round_id()).filter_by(uuid=alert_uuid).first_or_404()
+    alert_data = {'event_type': alert.event_type, 'user': alert.user, 'ip': alert.ip}
+    root = f"Alert_{alert.uuid}"
+
+    mimetype, ext = BUNDLE_FORMATS[fmt]
+    response = Response(stream_bundle(iter_challenge_files(alert_data, alert.uuid), root, fmt), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{root}.{ext}"'
+    return response
+
+@bp.route('/gc', methods=['GET'])
+def gc_stats():
+    """
+    GET /alerts/gc
+    Return challenge folder collector settings and its last report.
+    """
+    return jsonify(challenge_gc.stats()), 200
+
+@bp.route('/gc', methods=['POST'])
+def gc_run():
+    """
+    POST /alerts/gc?dry_run=1
+    Run one collection pass now and return its report.
+    """
+    dry_run = request.args.get('dry_run', type=int)
+    report = challenge_gc.collect(dry_run=None if dry_run is None else bool(dry_run))
+    return jsonify(report), 200
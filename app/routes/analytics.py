@@ -0,0 +1,46 @@
+# --- app/routes/analytics.py ---
+"""
+Analytics Blueprint: Serve per-minute submission rollups (attempts, solves and
+average solve time) for charts, by event type or by alert.
+"""
+
+from datetime import datetime
+from flask import Blueprint, request, jsonify, abort
+from ..services import analytics, rounds
+
+# Create a Blueprint for the analytics API
+bp = Blueprint('analytics', __name__, url_prefix='/analytics')
+
+def _parse_time(name):
+    """Optional ISO 8601 query parameter as a naive UTC datetime (400 if malformed)."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        abort(400, description=f"'{name}' must be an ISO 8601 timestamp")
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)  # Buckets are stored in naive UTC
+    return parsed
+
+@bp.route('/rollups')
+def rollups():
+    """
+    GET /analytics/rollups
+    Query params:
+        by: "event_type" (default) or "alert"
+        from, to: ISO 8601 range of bucket start times (from inclusive, to exclusive)
+        key: only one event type / alert UUID
+        round: round id of the current event (default: its current round)
+    Returns:
+        JSON {"round", "by", "bucket_seconds", "points": [...]} in time order
+    """
+    by = request.args.get('by', 'event_type')
+    if by not in ('event_type', 'alert'):
+        abort(400, description="'by' must be 'event_type' or 'alert'")
+    round_id = request.args.get('round', type=int) or rounds.current_round_id()
+    if rounds.event_of(round_id) != rounds.event_name():
+        abort(404)  # Only the requesting event's rounds are visible
+    points = analytics.series(by, round_id, _parse_time('from'), _parse_time('to'), request.args.get('key'))
+    return jsonify({'round': round_id, 'by': by, 'bucket_seconds': analytics.BUCKET_SECONDS, 'points': points})
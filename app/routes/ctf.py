@@ -3,12 +3,24 @@
 CTF Blueprint: Manage user-facing dashboard, flag submission flow, and starting the CTF challenges.
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, make_response, abort
 from ..models import Alert, Submission, Flag
 from .. import db, socketio
-from ..services.ctf_service import generate_random_alert
-from app.constants import MAX_ALERTS_ON_START
+from ..services.warm_pool import warm_pool
+from ..services.render_cache import alert_table_cache
+from ..services.flag_cache import flag_cache
+from ..services.flag_crypto import flag_digest
+from ..services.submission_queue import submission_queue
+from ..services.scoreboard import scoreboard
+from ..services.rate_limit import submit_limiter
+from ..services import analytics, cluster, rounds
+from ..services.alert_events import publish_alert_delta, current_version
+from app.constants import MAX_ALERTS_ON_START, SCOREBOARD_SIZE
+from sqlalchemy import insert, or_
 from datetime import datetime
+import hmac
+import json
+import math
 import uuid
 
 # Create a Blueprint for the main CTF challenge site
@@ -19,93 +31,357 @@ def dashboard():
     """
     GET /
     Main dashboard route.
-    Displays all current active alerts.
+    Displays all active alerts of the current round (?event=<name> picks the event).
+    The alert table is served from a cache keyed by the alert-set version,
+    so no database query runs until alerts are created, solved or reset.
     """
-    alerts = Alert.query.outerjoin(Submission) \
-        .filter((Submission.completed == False) | (Submission.id == None)).all()
-    return render_template('dashboard.html', alerts=alerts)
+    round_id = rounds.current_round_id()
+    version = current_version(round_id)
+    rows, count, hit = alert_table_cache.get(round_id)
+    response = make_response(render_template('dashboard.html', alert_rows=rows, alert_count=count, alerts_version=version))
+    response.headers['X-Render-Cache'] = 'hit' if hit else 'miss'
+    return response
 
 @bp.route('/submit_flag', methods=['POST'])
 def submit_flag():
     """
     POST /submit_flag
     Handle a user's flag submission (either via form or AJAX request).
+    The alert UUID is optional: a flag alone is resolved to its alert by digest.
     """
     # --- Extract user input ---
     if request.is_json:
-        data = request.get_json()
-        alert_uuid = data.get('uuid')
-        user_flag = data.get('flag', '').strip()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'message': 'Expected a JSON object with a flag.', 'success': False}), 400
+        # JSON values may be numbers etc.: everything is handled as text
+        alert_uuid = str(data['uuid']) if data.get('uuid') else None
+        user_flag = str(data.get('flag') or '').strip()
+        player = data.get('player')
     else:
-        alert_uuid = request.form.get('uuid')
+        alert_uuid = request.form.get('uuid') or None
         user_flag = request.form.get('flag', '').strip()
+        player = request.form.get('player')
+    player = _player_name(player)
 
-    # --- Lookup correct flag ---
-    alert = Alert.query.get_or_404(alert_uuid)
-    correct_flag = alert.flag.value
+    # --- Shed brute-force guessing before any database work ---
+    retry_after = submit_limiter.check(request.remote_addr, alert_uuid)
+    if retry_after:
+        response = jsonify({'message': 'Too many submissions, slow down.', 'success': False})
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response, 429
 
-    # --- Calculate score penalty based on elapsed time ---
-    elapsed_secs = 0
-    if getattr(alert.flag, 'created_at', None):
-        elapsed_secs = (datetime.utcnow() - alert.flag.created_at).total_seconds()
+    # --- Lookup correct flag digest (in-process cache first, one indexed query on a miss) ---
+    # Only alerts of the player's current round accept submissions
+    round_id = rounds.current_round_id()
+    submitted_digest = flag_digest(user_flag)
+    if alert_uuid is None:
+        # Flag-only mode: the digest identifies the alert
+        found = flag_cache.get_by_digest(submitted_digest)
+        if found is None or found[1][2] != round_id:
+            row = (db.session.query(Flag.uuid, Flag.digest, Flag.created_at, Flag.round_id)
+                   .filter_by(digest=submitted_digest, round_id=round_id).first())
+            if row is None:
+                # Nothing to attribute the guess to, so there is no submission to record
+                return _flag_result(False, 0, None)
+            found = (row.uuid, flag_cache.put(row.uuid, row.digest, row.created_at, row.round_id))
+        alert_uuid, cached = found
+    else:
+        cached = flag_cache.get(alert_uuid)
+        if cached is None:
+            # Columns only: no Flag/Alert objects are loaded
+            row = (db.session.query(Flag.digest, Flag.created_at, Flag.round_id)
+                   .filter_by(uuid=alert_uuid, round_id=round_id).first())
+            if row is None:
+                abort(404)
+            cached = flag_cache.put(alert_uuid, row.digest, row.created_at, row.round_id)
+    correct_digest, flag_created_at, flag_round_id = cached
+    if flag_round_id != round_id:
+        abort(404)
 
-    base = current_app.config.get('POINTS_BASE', 1000)
-    rate = current_app.config.get('PENALTY_RATE', 1)
-    penalty = min(int(elapsed_secs * rate), base)
-    score = max(base - penalty, 0)
+    # --- Calculate score penalty based on elapsed time ---
+    now = datetime.utcnow()
+    elapsed_secs = _elapsed_secs(flag_created_at, now)
+    score = _score_for(elapsed_secs)
 
     # --- Record submission result ---
-    completed = (user_flag == correct_flag)
-    sub = Submission(alert_uuid=alert_uuid, submitted_value=user_flag, score=score, completed=completed)
-    db.session.add(sub)
-    db.session.commit()
+    completed = hmac.compare_digest(submitted_digest, correct_digest)  # Constant-time comparison
+    if completed:
+        # Correct answers are written synchronously so the respawn logic and
+        # the flag_complete page see them; flush queued guesses first to keep order.
+        submission_queue.flush()
+        # Only the first correct answer scores: the guarded UPDATE (no Alert load) picks it
+        if not Alert.query.filter_by(uuid=alert_uuid, solved_at=None).update({'solved_at': now}):
+            db.session.rollback()
+            return _flag_result(False, 0, alert_uuid, already_solved=True)
+        # The real flag is never stored in plaintext: a correct row keeps its digest
+        row = {'alert_uuid': alert_uuid, 'round_id': round_id, 'player': player, 'submitted_value': submitted_digest,
+               'score': score, 'completed': True, 'timestamp': now}
+        db.session.add(Submission(**row))
+        analytics.record_submissions([row], {alert_uuid: elapsed_secs})
+        db.session.commit()
+        scoreboard.record(player, score, round_id)
+        cluster.broadcast('scoreboard_record', {'player': player, 'points': score, 'round': round_id})
+        socketio.emit('scoreboard', {'top': scoreboard.top(SCOREBOARD_SIZE, round_id)}, to=rounds.room(rounds.event_name()))
+    else:
+        # Wrong guesses go through the write-behind queue
+        submission_queue.enqueue(alert_uuid=alert_uuid, round_id=round_id, player=player, submitted_value=user_flag, score=score,
+                                 completed=False, timestamp=now)
 
     # --- If correct, maybe spawn a new alert if active count is below limit ---
     if completed:
-        active = Alert.query.filter(
-            ~Alert.submissions.any(Submission.completed == True)
-        ).count()
+        added = []
+        active = Alert.active(round_id).count()
         if active < current_app.config.get('MAX_ALERTS', 5):
-            new_uuid = generate_random_alert()
-            socketio.emit('new_alert', {'uuid': new_uuid})
+            added.extend(warm_pool.publish(1, round_id))  # Pre-built alert from the warm pool when one is ready
+        publish_alert_delta(added=added, solved=[alert_uuid], round_id=round_id)
+
+    return _flag_result(completed, score, alert_uuid)
+
+def _player_name(player):
+    """Submitted player name (any JSON scalar, as text), falling back to the client address."""
+    name = '' if player is None else str(player).strip()
+    return (name or request.remote_addr or 'anonymous')[:64]
+
+def _elapsed_secs(flag_created_at, now):
+    """Seconds since a flag went live."""
+    return (now - flag_created_at).total_seconds() if flag_created_at else 0
 
+def _score_for(elapsed_secs):
+    """Points for a solve: POINTS_BASE minus PENALTY_RATE per second since the flag went live."""
+    base = current_app.config.get('POINTS_BASE', 1000)
+    rate = current_app.config.get('PENALTY_RATE', 1)
+    penalty = min(int(elapsed_secs * rate), base)
+    return max(base - penalty, 0)
+
+def _flag_result(completed, score, alert_uuid, already_solved=False):
+    """Response for a flag submission (JSON for AJAX, flash + redirect for forms)."""
     # --- Prepare response ---
-    message = f"✅ Correct! You scored {score} points." if completed else '❌ Incorrect flag, try again.'
+    if already_solved:
+        message = 'ℹ️ This alert has already been solved, no points awarded.'
+    else:
+        message = f"✅ Correct! You scored {score} points." if completed else '❌ Incorrect flag, try again.'
     success = completed
 
     # --- Return response depending on submission type ---
     if request.is_json:
-        return jsonify({'message': message, 'success': success, 'score': score})
+        body = {'message': message, 'success': success, 'score': score}
+        if completed or already_solved:
+            body['uuid'] = alert_uuid  # Lets flag-only clients see which alert the flag belongs to
+        if already_solved:
+            body['already_solved'] = True
+        return jsonify(body)
 
     if completed:
         flash(message, 'success')
         return redirect(url_for('ctf.flag_complete', uuid=alert_uuid))
     else:
-        flash(message, 'danger')
+        flash(message, 'info' if already_solved else 'danger')
         return redirect(url_for('ctf.dashboard'))
 
+def _batch_items():
+    """Items of a batch submission body (JSON array or NDJSON), or None if it is malformed."""
+    body = request.get_data(as_text=True)
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return None
+    return items
+
+def _already_solved(alert_uuid):
+    """Batch result for a correct flag of an alert that was solved before it."""
+    return {'uuid': alert_uuid, 'success': False, 'status': 'already_solved', 'score': 0}
+
+@bp.route('/submit_flag/batch', methods=['POST'])
+def submit_flag_batch():
+    """
+    POST /submit_flag/batch
+    Submit many flags in one request, for team scripts and bots.
+
+    Body: a JSON array, or NDJSON (Content-Type: application/x-ndjson), of
+    {"uuid": ..., "flag": ..., "player": ...} objects. As in submit_flag, uuid
+    is optional and player falls back to ?player= and then the client address.
+
+    Flags not in the flag cache are resolved with one bulk query, and every
+    Submission row (right and wrong) is inserted in one transaction, together
+    with its analytics rollup counts. Scores
+    use the same POINTS_BASE/PENALTY_RATE rule as submit_flag.
+    As in submit_flag, only the first correct answer for an alert scores: later
+    ones, in this batch or after an earlier solve, are already_solved.
+
+    Returns:
+        JSON {"results": [...], "solved": n, "score": total}, one result per
+        item in order, each with a status of correct, already_solved,
+        incorrect, not_found (uuid not in the current round) or rate_limited.
+    """
+    items = _batch_items()
+    if items is None:
+        return jsonify({'message': 'Expected a JSON array or NDJSON of {uuid, flag} objects.', 'success': False}), 400
+    max_items = current_app.config.get('SUBMIT_BATCH_MAX_ITEMS', 500)
+    if len(items) > max_items:
+        return jsonify({'message': f'At most {max_items} flags per batch.', 'success': False}), 413
+
+    round_id = rounds.current_round_id()
+    default_player = request.args.get('player')
+    entries = []
+    for item in items:
+        user_flag = str(item.get('flag') or '').strip()
+        entries.append({'uuid': str(item['uuid']) if item.get('uuid') else None, 'flag': user_flag,
+                        'digest': flag_digest(user_flag), 'player': _player_name(item.get('player') or default_player)})
+    waits = submit_limiter.check_batch(request.remote_addr, [e['uuid'] for e in entries])
+
+    # --- Resolve every flag: cache first, then one bulk query for the misses ---
+    by_uuid, by_digest = {}, {}
+    missing_uuids, missing_digests = set(), set()
+    for entry, wait in zip(entries, waits):
+        if wait:
+            continue
+        if entry['uuid']:
+            cached = flag_cache.get(entry['uuid'])
+            if cached is not None and cached[2] == round_id:
+                by_uuid[entry['uuid']] = cached
+            else:
+                missing_uuids.add(entry['uuid'])
+        else:
+            found = flag_cache.get_by_digest(entry['digest'])
+            if found is not None and found[1][2] == round_id:
+                by_digest[entry['digest']] = found
+            else:
+                missing_digests.add(entry['digest'])
+    if missing_uuids or missing_digests:
+        rows = (db.session.query(Flag.uuid, Flag.digest, Flag.created_at, Flag.round_id)
+                .filter(Flag.round_id == round_id,
+                        or_(Flag.uuid.in_(missing_uuids), Flag.digest.in_(missing_digests))))
+        for row in rows:
+            cached = flag_cache.put(row.uuid, row.digest, row.created_at, row.round_id)
+            by_uuid[row.uuid] = cached
+            by_digest[row.digest] = (row.uuid, cached)
+
+    # --- Score each item and build its Submission row ---
+    now = datetime.utcnow()
+    results, rows, solves, solve_elapsed = [], [], [], {}
+    candidates = {}  # alert uuid -> (result index, row) of its first correct answer in the batch
+    for entry, wait in zip(entries, waits):
+        alert_uuid = entry['uuid']
+        if wait:
+            results.append({'uuid': alert_uuid, 'success': False, 'status': 'rate_limited',
+                            'retry_after': max(1, math.ceil(wait))})
+            continue
+        if alert_uuid is None:
+            found = by_digest.get(entry['digest'])
+            if found is None:
+                # Nothing to attribute the guess to, so there is no submission to record
+                results.append({'uuid': None, 'success': False, 'status': 'incorrect', 'score': 0})
+                continue
+            alert_uuid, cached = found
+        else:
+            cached = by_uuid.get(alert_uuid)
+            if cached is None:
+                results.append({'uuid': alert_uuid, 'success': False, 'status': 'not_found'})
+                continue
+        correct_digest, flag_created_at, _ = cached
+        solve_elapsed[alert_uuid] = _elapsed_secs(flag_created_at, now)
+        score = _score_for(solve_elapsed[alert_uuid])
+        completed = hmac.compare_digest(entry['digest'], correct_digest)
+        row = {'alert_uuid': alert_uuid, 'round_id': round_id, 'player': entry['player'],
+               'submitted_value': entry['digest'] if completed else entry['flag'],  # Never the real flag in plaintext
+               'score': score, 'completed': completed, 'timestamp': now}
+        if not completed:
+            rows.append(row)
+            results.append({'uuid': alert_uuid, 'success': False, 'status': 'incorrect', 'score': score})
+        elif alert_uuid in candidates:
+            results.append(_already_solved(alert_uuid))  # Same alert earlier in this batch
+        else:
+            candidates[alert_uuid] = (len(results), row)
+            results.append({'uuid': alert_uuid, 'success': True, 'status': 'correct', 'score': score})
+
+    # --- Record everything in one transaction ---
+    solved = []
+    if rows or candidates:
+        submission_queue.flush()  # Keep earlier queued guesses ahead of this batch
+        if candidates:
+            unsolved = {u for (u,) in db.session.query(Alert.uuid)
+                        .filter(Alert.uuid.in_(candidates), Alert.solved_at.is_(None))}
+            for alert_uuid, (i, row) in candidates.items():
+                # The guarded UPDATE picks the first solver, even against concurrent submissions
+                if alert_uuid in unsolved and Alert.query.filter_by(uuid=alert_uuid, solved_at=None).update(
+                        {'solved_at': now}, synchronize_session=False):
+                    solved.append(alert_uuid)
+                    rows.append(row)
+                    solves.append((row['player'], row['score']))
+                else:
+                    results[i] = _already_solved(alert_uuid)
+        if rows:
+            db.session.execute(insert(Submission), rows)
+            analytics.record_submissions(rows, solve_elapsed)
+        db.session.commit()
+
+    if solves:
+        scoreboard.record_many(solves, round_id)
+        for player, score in solves:
+            cluster.broadcast('scoreboard_record', {'player': player, 'points': score, 'round': round_id})
+        socketio.emit('scoreboard', {'top': scoreboard.top(SCOREBOARD_SIZE, round_id)}, to=rounds.room(rounds.event_name()))
+
+        # --- Respawn up to one alert per solve, below the MAX_ALERTS limit ---
+        room_left = current_app.config.get('MAX_ALERTS', 5) - Alert.active(round_id).count()
+        added = warm_pool.publish(min(len(solved), room_left), round_id)
+        publish_alert_delta(added=added, solved=solved, round_id=round_id)
+
+    return jsonify({'results': results, 'solved': len(solves), 'score': sum(score for _, score in solves)})
+
 @bp.route('/flag_complete/<string:uuid>')
 def flag_complete(uuid):
     """
     GET /flag_complete/<uuid>
     Displays a success page after solving an alert correctly.
     """
-    submission = Submission.query.filter_by(alert_uuid=uuid, completed=True).order_by(Submission.timestamp.desc()).first()
+    submission = (Submission.query.filter_by(alert_uuid=uuid, round_id=rounds.current_round_id(), completed=True)
+                  .order_by(Submission.timestamp.desc()).first())
     if not submission:
         flash('No completed submission found.', 'danger')
         return redirect(url_for('ctf.dashboard'))
     return render_template('flag_complete.html', submission=submission)
 
+@bp.route('/submissions/queue')
+def submission_queue_stats():
+    """
+    GET /submissions/queue
+    Return write-behind queue depth and flush latency as JSON.
+    """
+    return jsonify(submission_queue.stats())
+
+@bp.route('/scoreboard')
+def scoreboard_view():
+    """
+    GET /scoreboard
+    Return the current round's top players as JSON (served from memory, no DB query).
+
+    Query params:
+        limit:  number of leaders to return (default SCOREBOARD_SIZE)
+        player: also include this player's own rank and total
+    """
+    round_id = rounds.current_round_id()
+    limit = request.args.get('limit', SCOREBOARD_SIZE, type=int)
+    result = {'top': scoreboard.top(max(limit, 0), round_id), 'players': scoreboard.players(round_id)}
+    player = request.args.get('player')
+    if player:
+        result['player'] = scoreboard.entry(player, round_id)
+    return jsonify(result)
+
 @bp.route('/start_ctf', methods=['POST'])
 def start_ctf():
     """
     POST /start_ctf
-    Start a new CTF session by generating MAX_ALERTS_ON_START alerts/challenges.
+    Fill the current round up to MAX_ALERTS_ON_START alerts/challenges.
     """
     # --- Check current active alert count ---
-    active_count = Alert.query.outerjoin(Submission) \
-                   .filter((Submission.completed == False) | (Submission.id == None)) \
-                   .count()
+    round_id = rounds.current_round_id()
+    active_count = Alert.active(round_id).count()
 
     if active_count >= MAX_ALERTS_ON_START:
         # Already enough active alerts, just reload dashboard
@@ -113,8 +389,8 @@ def start_ctf():
     
     # --- Create new alerts up to MAX_ALERTS_ON_START ---
     to_create = MAX_ALERTS_ON_START - active_count
-    for _ in range(to_create):
-        generate_random_alert()
+    new_uuids = warm_pool.publish(to_create, round_id)  # Warm pool first, one batch transaction for the rest
+    publish_alert_delta(added=new_uuids, round_id=round_id)
 
     # --- Reload dashboard with new challenges ---
     return redirect(url_for('ctf.dashboard'))
@@ -122,18 +398,34 @@ def start_ctf():
 @bp.route('/reset_ctf', methods=['POST'])
 def reset_ctf():
     """
-    Resets the CTF round:
-    - Deletes all current Alerts, Flags, Submissions
-    - Generates a fresh batch of new alerts
+    Resets the CTF round of the current event:
+    - Ends the current round (its Alerts, Flags and Submissions stay as an archive;
+      its challenge folders are removed later by the collector)
+    - Starts a new round and publishes a fresh batch of alerts into it
+    Cost doesn't depend on how much history the event has, and other events are untouched.
     """
-    # Delete all existing challenges
-    Submission.query.delete()
-    Flag.query.delete()
-    Alert.query.delete()
-    db.session.commit()
+    previous, round_id = rounds.start_round()
+    flag_cache.drop_round(previous)  # Answers of the ended round no longer verify
+    scoreboard.drop(previous)        # (other workers do the same on 'round_started')
 
-    # Generate new alerts
-    for _ in range(MAX_ALERTS_ON_START):
-        generate_random_alert()
+    # Publish new alerts
+    new_uuids = warm_pool.publish(MAX_ALERTS_ON_START, round_id)
+    publish_alert_delta(added=new_uuids, reset=True, round_id=round_id)
 
     return redirect(url_for('ctf.dashboard'))
+
+@bp.route('/rounds')
+def list_rounds():
+    """
+    GET /rounds
+    Return the current event's rounds as JSON, newest first (the first one is current).
+    """
+    return jsonify({
+        'event': rounds.event_name(),
+        'current': rounds.current_round_id(),
+        'rounds': [{
+            'id': r.id,
+            'started_at': r.started_at.isoformat() if r.started_at else None,
+            'ended_at': r.ended_at.isoformat() if r.ended_at else None,
+        } for r in rounds.rounds_for_event()],
+    })
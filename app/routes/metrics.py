@@ -0,0 +1,21 @@
+# --- app/routes/metrics.py ---
+"""
+Metrics Blueprint: Expose request, SQL and challenge-build instrumentation
+in Prometheus text format for scraping.
+"""
+
+from flask import Blueprint, Response, abort
+from ..services.metrics import metrics
+
+# Create a Blueprint for the monitoring endpoint
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics')
+def metrics_view():
+    """
+    GET /metrics
+    Return all collected metrics (404 when METRICS_ENABLED is off).
+    """
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
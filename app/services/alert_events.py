@@ -0,0 +1,132 @@
+# --- app/services/alert_events.py ---
+"""
+Versioned alert-set change events.
+Every change to a round's set of live alerts (create, solve, reset) bumps a
+monotonically increasing version and is pushed to that event's browsers as a
+Socket.IO delta, so clients can patch the dashboard table instead of reloading it.
+
+Versions are allocated from the AlertSetVersion row so all worker processes
+share one sequence; each round records the last version published for it, and
+each delta carries the round's previous version so clients can spot a gap.
+Every process keeps an in-memory copy per round for cheap reads, updated by
+its own publishes and by deltas relayed from other workers.
+"""
+
+import uuid
+from flask import render_template
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from .. import db, socketio
+from ..models import Alert, AlertSetVersion, Round
+from . import rounds
+
+# In-memory copy of each round's alert-set version (round id -> version)
+_versions = {}
+
+# Token identifying the database's version sequence (replaced when loaded from the DB)
+_epoch = uuid.uuid4().hex[:8]
+
+def init_app(app):
+    """Load the sequence's epoch from the database; a missing schema just means a fresh sequence."""
+    _versions.clear()
+    with app.app_context():
+        try:
+            row = db.session.get(AlertSetVersion, 1)
+        except SQLAlchemyError:
+            row = None  # Tables not created yet (e.g. fresh install or tests)
+        if row:
+            _set_epoch(row.epoch)
+
+def _set_epoch(epoch):
+    global _epoch
+    _epoch = epoch
+
+def current_version(round_id=None):
+    """Return the current alert-set version of a round (default: the request's current round)."""
+    round_id = round_id or rounds.current_round_id()
+    version = _versions.get(round_id)
+    if version is None:
+        row = db.session.get(Round, round_id)
+        version = row.version if row else 0
+        observe_version(version, round_id)
+    return version
+
+def version_tag(round_id=None):
+    """Return a database-unique tag for a round's current version (used for HTTP ETags and caches)."""
+    round_id = round_id or rounds.current_round_id()
+    return f"{_epoch}-{round_id}-{current_version(round_id)}"
+
+def observe_version(version, round_id=None):
+    """Advance a round's in-memory version (e.g. after another worker published a delta)."""
+    round_id = round_id or rounds.current_round_id()
+    _versions[round_id] = max(_versions.get(round_id, 0), version)
+
+def _allocate_version(round_id):
+    """
+    Atomically bump the shared version row, record it on the round,
+    and return (the round's previous version, the new version).
+    """
+    for _ in range(2):
+        bumped = AlertSetVersion.query.filter_by(id=1).update({'version': AlertSetVersion.version + 1})
+        if not bumped:
+            db.session.add(AlertSetVersion(id=1, version=1))
+        try:
+            db.session.flush()
+            version, epoch = db.session.execute(
+                select(AlertSetVersion.version, AlertSetVersion.epoch).where(AlertSetVersion.id == 1)
+            ).one()
+            previous = db.session.execute(select(Round.version).where(Round.id == round_id)).scalar() or 0
+            Round.query.filter_by(id=round_id).update({'version': version})
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Another worker created the row first; bump it instead
+            continue
+        _set_epoch(epoch)
+        observe_version(version, round_id)
+        return previous, version
+    raise RuntimeError("Could not allocate an alert-set version")
+
+def render_alert_row(alert):
+    """Render one dashboard table row for an alert."""
+    return {'uuid': alert.uuid, 'html': render_template('_alert_row.html', alert=alert)}
+
+def active_alerts_snapshot(round_id=None):
+    """Full resync payload: a round's current version plus every active alert row."""
+    round_id = round_id or rounds.current_round_id()
+    return {
+        'round': round_id,
+        'version': current_version(round_id),
+        'alerts': [render_alert_row(a) for a in Alert.active(round_id).all()],
+    }
+
+def publish_alert_delta(added=(), solved=(), removed=(), reset=False, round_id=None):
+    """
+    Bump a round's alert-set version and emit an 'alerts_delta' Socket.IO event
+    to the dashboards of its event.
+
+    Args:
+        added: UUIDs of newly created alerts (sent as rendered rows)
+        solved: UUIDs of alerts that were just solved
+        removed: UUIDs of alerts that no longer exist
+        reset: True if clients should clear the table before applying `added`
+        round_id: round that changed (default: the request's current round)
+
+    Returns:
+        The emitted payload
+    """
+    round_id = round_id or rounds.current_round_id()
+    previous, version = _allocate_version(round_id)
+
+    added = list(added)
+    rows = Alert.query.filter(Alert.uuid.in_(added)).all() if added else []
+    payload = {
+        'round': round_id,
+        'version': version,
+        'previous': previous,
+        'added': [render_alert_row(a) for a in rows],
+        'solved': list(solved),
+        'removed': list(removed),
+        'reset': reset,
+    }
+    socketio.emit('alerts_delta', payload, to=rounds.room(rounds.event_of(round_id)))
+    return payload
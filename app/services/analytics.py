@@ -0,0 +1,168 @@
+# --- app/services/analytics.py ---
+"""
+Per-minute submission rollups for solve-time and attempt-rate charts.
+Every path that writes Submission rows adds them to the EventTypeRollup and
+AlertRollup counters in the same transaction (one bulk upsert per table), so
+charts are range scans over small tables instead of aggregates over every
+submission joined with its alert.
+"""
+
+from collections import defaultdict
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import db
+from ..models import Alert, AlertRollup, EventTypeRollup, Flag, Submission
+from app.constants import event_difficulty
+
+# Width of a rollup bucket
+BUCKET_SECONDS = 60
+
+# Columns added together when a bucket already exists
+COUNTERS = ('attempts', 'solves', 'elapsed_total')
+
+# Submissions read per query by backfill()
+BACKFILL_CHUNK = 5000
+
+_settings = {'enabled': True}
+
+def init_app(app):
+    """Read settings and register the backfill command."""
+    _settings['enabled'] = app.config.get('ANALYTICS_ROLLUPS_ENABLED', True)
+    app.cli.add_command(backfill_rollups_command)
+
+def bucket_of(timestamp):
+    """Start of the minute a timestamp falls in."""
+    return timestamp.replace(second=0, microsecond=0)
+
+def rollup_event_type(event_type):
+    """Event type as keyed in event_difficulty (unknown types count as 'Other')."""
+    return event_type if event_type in event_difficulty else 'Other'
+
+def record_submissions(rows, solve_elapsed=None):
+    """
+    Add Submission rows (column dicts, as inserted) to the rollups, in the caller's transaction.
+
+    Args:
+        rows: dicts with alert_uuid, round_id, timestamp and completed
+        solve_elapsed: alert uuid -> seconds between the flag going live and its correct submission
+    """
+    if not _settings['enabled'] or not rows:
+        return
+    solve_elapsed = solve_elapsed or {}
+    uuids = {row['alert_uuid'] for row in rows}
+    event_types = dict(db.session.query(Alert.uuid, Alert.event_type).filter(Alert.uuid.in_(uuids)))
+    _apply([(row['alert_uuid'], row.get('round_id'), row['timestamp'], row['completed'],
+             solve_elapsed.get(row['alert_uuid'], 0.0)) for row in rows], event_types)
+
+def _apply(entries, event_types):
+    """Aggregate (alert_uuid, round_id, timestamp, completed, elapsed) entries and upsert them."""
+    by_alert = defaultdict(lambda: [0, 0, 0.0])  # (alert_uuid, bucket, round_id, event_type) -> counters
+    by_type = defaultdict(lambda: [0, 0, 0.0])   # (round_id, bucket, event_type) -> counters
+    for alert_uuid, round_id, timestamp, completed, elapsed in entries:
+        event_type = rollup_event_type(event_types.get(alert_uuid))
+        bucket = bucket_of(timestamp)
+        for counters in (by_alert[(alert_uuid, bucket, round_id, event_type)], by_type[(round_id, bucket, event_type)]):
+            counters[0] += 1
+            if completed:
+                counters[1] += 1
+                counters[2] += elapsed
+
+    _upsert(AlertRollup, ('alert_uuid', 'bucket'), [
+        {'alert_uuid': alert_uuid, 'bucket': bucket, 'round_id': round_id, 'event_type': event_type,
+         **dict(zip(COUNTERS, counters))}
+        for (alert_uuid, bucket, round_id, event_type), counters in by_alert.items()])
+    _upsert(EventTypeRollup, ('round_id', 'bucket', 'event_type'), [
+        {'round_id': round_id, 'bucket': bucket, 'event_type': event_type, **dict(zip(COUNTERS, counters))}
+        for (round_id, bucket, event_type), counters in by_type.items() if round_id is not None])
+
+def _upsert(model, keys, rows):
+    """Insert rollup rows, adding their counters to any bucket that already exists."""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in COUNTERS})
+        db.session.execute(stmt, rows)
+        return
+    # Other databases: read-modify-write through the ORM
+    for row in rows:
+        existing = db.session.get(model, tuple(row[k] for k in keys))
+        if existing is None:
+            db.session.add(model(**row))
+        else:
+            for name in COUNTERS:
+                setattr(existing, name, getattr(existing, name) + row[name])
+
+def series(by, round_id, start=None, end=None, key=None):
+    """
+    Rollup buckets of a round in time order.
+
+    Args:
+        by: 'event_type' or 'alert'
+        start, end: optional datetime range (start inclusive, end exclusive)
+        key: only this event type / alert UUID
+
+    Returns:
+        List of {bucket, event_type[, alert], attempts, solves, avg_elapsed} dicts
+    """
+    model = AlertRollup if by == 'alert' else EventTypeRollup
+    query = model.query.filter(model.round_id == round_id)
+    if start is not None:
+        query = query.filter(model.bucket >= bucket_of(start))
+    if end is not None:
+        query = query.filter(model.bucket < end)
+    if key:
+        query = query.filter((model.alert_uuid if by == 'alert' else model.event_type) == key)
+
+    points = []
+    for row in query.order_by(model.bucket):
+        point = {'bucket': row.bucket.isoformat(), 'event_type': row.event_type,
+                 'attempts': row.attempts, 'solves': row.solves,
+                 'avg_elapsed': round(row.elapsed_total / row.solves, 3) if row.solves else None}
+        if by == 'alert':
+            point['alert'] = row.alert_uuid
+        points.append(point)
+    return points
+
+def backfill(round_id=None):
+    """
+    Rebuild the rollups from the submissions table (every round, or one).
+    Existing rollup rows in scope are replaced. Returns the number of submissions counted.
+    """
+    for model in (AlertRollup, EventTypeRollup):
+        query = model.query if round_id is None else model.query.filter(model.round_id == round_id)
+        query.delete(synchronize_session=False)
+
+    counted, last_id = 0, 0
+    while True:
+        query = (db.session.query(Submission.id, Submission.alert_uuid, Submission.round_id, Submission.timestamp,
+                                  Submission.completed, Flag.created_at, Alert.event_type)
+                 .join(Alert, Alert.uuid == Submission.alert_uuid)
+                 .outerjoin(Flag, Flag.uuid == Submission.alert_uuid)
+                 .filter(Submission.id > last_id))
+        if round_id is not None:
+            query = query.filter(Submission.round_id == round_id)
+        chunk = query.order_by(Submission.id).limit(BACKFILL_CHUNK).all()
+        if not chunk:
+            break
+        _apply([(row.alert_uuid, row.round_id, row.timestamp, row.completed,
+                 (row.timestamp - row.created_at).total_seconds() if row.completed and row.created_at else 0.0)
+                for row in chunk],
+               {row.alert_uuid: row.event_type for row in chunk})
+        counted += len(chunk)
+        last_id = chunk[-1].id
+    db.session.commit()
+    return counted
+
+@click.command('backfill-rollups')
+@click.option('--round', 'round_id', type=int, default=None, help='Only rebuild this round (default: every round).')
+@with_appcontext
+def backfill_rollups_command(round_id):
+    """Rebuild the submission analytics rollups from existing submissions."""
+    click.echo(f"Rolled up {backfill(round_id)} submissions")
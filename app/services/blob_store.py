@@ -0,0 +1,99 @@
+# --- app/services/blob_store.py ---
+"""
+Content-addressed blob store for challenge files.
+Identical file bodies are written once under <challenge base>/.blobs/ and
+hardlinked into each Alert_<uuid> tree, saving disk space and inodes.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from eventlet.patcher import original
+
+# Directory (inside the challenge base dir) holding the shared blobs
+BLOB_DIR_NAME = ".blobs"
+
+class DedupStats:
+    """Running totals of files placed through the blob store (for the dedup ratio)."""
+
+    def __init__(self):
+        self._lock = original('threading').Lock()  # A real lock: builds run in OS threads under eventlet
+        self.reset()
+
+    def reset(self):
+        self.logical_files = 0    # Files that appear in alert trees
+        self.logical_bytes = 0    # Bytes those files would take as separate copies
+        self.physical_files = 0   # Blobs (or fallback copies) actually written
+        self.physical_bytes = 0   # Bytes actually written to disk
+
+    def record(self, size, written):
+        with self._lock:
+            self.logical_files += 1
+            self.logical_bytes += size
+            if written:
+                self.physical_files += 1
+                self.physical_bytes += size
+
+    @property
+    def ratio(self):
+        """Logical bytes per physical byte written (1.0 = no savings)."""
+        return self.logical_bytes / self.physical_bytes if self.physical_bytes else 1.0
+
+    def stats(self):
+        return {
+            'logical_files': self.logical_files,
+            'logical_bytes': self.logical_bytes,
+            'physical_files': self.physical_files,
+            'physical_bytes': self.physical_bytes,
+            'dedup_ratio': round(self.ratio, 3),
+        }
+
+# Shared counters across every BlobStore instance
+dedup_stats = DedupStats()
+
+class BlobStore:
+    """
+    Blobs live at <root>/<sha256[:2]>/<sha256> and are made read-only, so
+    editing one alert's copy can't silently change every tree sharing it.
+    """
+
+    def __init__(self, base_dir):
+        self.root = Path(base_dir) / BLOB_DIR_NAME
+
+    def blob_path(self, digest):
+        return self.root / digest[:2] / digest
+
+    def _ensure_blob(self, content, digest):
+        """Write the blob if it doesn't exist yet. Returns True if it was written now."""
+        blob = self.blob_path(digest)
+        if blob.exists():
+            return False
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = blob.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(content)
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, blob)  # Atomic, so concurrent writers never expose a partial blob
+        return True
+
+    def place(self, content, dest):
+        """
+        Make `dest` contain `content`, hardlinked to the shared blob.
+        Falls back to a plain copy if hardlinking isn't possible (e.g. another filesystem).
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        written = self._ensure_blob(content, digest)
+
+        dest = Path(dest)
+        if dest.exists() or dest.is_symlink():
+            dest.unlink()
+        try:
+            os.link(self.blob_path(digest), dest)
+        except OSError:
+            dest.write_bytes(content)
+            written = True
+        dedup_stats.record(len(content), written)
+        return written
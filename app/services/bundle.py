@@ -0,0 +1,126 @@
+# --- app/services/bundle.py ---
+"""
+Stream challenge trees as zip or tar archives, built chunk by chunk in memory.
+No temp files are written; each file is generated, compressed and handed to
+the response before the next one is produced.
+
+Tar needs constant memory, so it is the default. A zip has to end with a
+central directory listing every file, so stream_zip() keeps one packed
+record per file (46 bytes plus the path) until the end: O(files) memory,
+about 100 MB for a 10^6-file tree.
+"""
+
+import io
+import struct
+import tarfile
+import time
+import zlib
+
+# Archive formats served by GET /alerts/<uuid>/bundle -> (mimetype, file extension)
+BUNDLE_FORMATS = {
+    'zip': ('application/zip', 'zip'),
+    'tar': ('application/x-tar', 'tar'),
+    'tar.gz': ('application/gzip', 'tar.gz'),
+}
+
+# Format served when none is requested (the one streamed in constant memory)
+DEFAULT_BUNDLE_FORMAT = 'tar'
+
+# Zip record layouts (little-endian; see the PKWARE APPNOTE)
+_ZIP_LOCAL = struct.Struct('<4s5H3L2H')            # Local file header
+_ZIP_CENTRAL = struct.Struct('<4s6H3L5H2L')        # Central directory record
+_ZIP64_END = struct.Struct('<4sQ2H2L4Q')           # Zip64 end of central directory record
+_ZIP64_LOCATOR = struct.Struct('<4sLQL')           # Zip64 end of central directory locator
+_ZIP_END = struct.Struct('<4s4H2LH')               # End of central directory record
+_ZIP_UTF8 = 0x800                                  # General purpose flag: names are UTF-8
+_ZIP_MAX_16, _ZIP_MAX_32 = 0xFFFF, 0xFFFFFFFF      # Beyond these, Zip64 fields take over
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable stream that buffers output until drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Return (and forget) everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _dos_time(t):
+    """(time, date) fields of a zip header for a struct_time."""
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+def stream_zip(entries, root):
+    """
+    Yield a deflated zip archive of `entries` ((relative_path, body, ...) tuples) under `root`/.
+    Each file is yielded as soon as it is compressed; only its packed central
+    directory record (46 bytes plus the path) is kept until the end, so memory
+    grows with the number of files (use tar for constant memory). Zip64 records
+    are added when the archive passes 65,535 files or 4 GiB.
+    """
+    dos_time, dos_date = _dos_time(time.localtime())
+    central = bytearray()
+    offset = count = 0
+    for rel_path, body, *_ in entries:
+        name = f"{root}/{rel_path}".encode('utf-8')
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)  # Raw deflate
+        packed = compressor.compress(data) + compressor.flush()
+        crc = zlib.crc32(data)
+        header = _ZIP_LOCAL.pack(b'PK\x03\x04', 20, _ZIP_UTF8, 8, dos_time, dos_date,
+                                 crc, len(packed), len(data), len(name), 0)
+        yield header + name + packed
+
+        extra, version = b'', 20
+        if offset >= _ZIP_MAX_32:
+            extra, version = struct.pack('<2HQ', 1, 8, offset), 45  # Zip64 extra field: local header offset
+        central += _ZIP_CENTRAL.pack(b'PK\x01\x02', (3 << 8) | version, version, _ZIP_UTF8, 8, dos_time, dos_date,
+                                     crc, len(packed), len(data), len(name), len(extra), 0, 0, 0, 0o644 << 16,
+                                     min(offset, _ZIP_MAX_32))
+        central += name + extra
+        offset += len(header) + len(name) + len(packed)
+        count += 1
+
+    # --- Central directory (in slices, so it is never copied whole), then the end records ---
+    for start in range(0, len(central), 1 << 16):
+        yield bytes(central[start:start + (1 << 16)])
+    end = b''
+    if count >= _ZIP_MAX_16 or offset >= _ZIP_MAX_32 or len(central) >= _ZIP_MAX_32:
+        zip64_end = offset + len(central)
+        end += _ZIP64_END.pack(b'PK\x06\x06', _ZIP64_END.size - 12, 45, 45, 0, 0, count, count, len(central), offset)
+        end += _ZIP64_LOCATOR.pack(b'PK\x06\x07', 0, zip64_end, 1)
+    end += _ZIP_END.pack(b'PK\x05\x06', 0, 0, min(count, _ZIP_MAX_16), min(count, _ZIP_MAX_16),
+                         min(len(central), _ZIP_MAX_32), min(offset, _ZIP_MAX_32), 0)
+    yield end
+
+def stream_tar(entries, root, compress=False):
+    """Yield a (optionally gzipped) tar archive of `entries` under `root`/, in constant memory."""
+    sink = _ChunkSink()
+    now = time.time()
+    with tarfile.open(fileobj=sink, mode='w|gz' if compress else 'w|') as tar:
+        for rel_path, body, *_ in entries:
+            data = body.encode('utf-8') if isinstance(body, str) else body
+            info = tarfile.TarInfo(f"{root}/{rel_path}")
+            info.size = len(data)
+            info.mtime = now
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+            tar.members.clear()  # Streaming only: don't keep every member's header in memory
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()  # End-of-archive blocks
+
+def stream_bundle(entries, root, fmt):
+    """Dispatch to the zip/tar streamer for one of BUNDLE_FORMATS."""
+    if fmt == 'zip':
+        return stream_zip(entries, root)
+    return stream_tar(entries, root, compress=(fmt == 'tar.gz'))
@@ -0,0 +1,247 @@
+# --- app/services/challenge_gc.py ---
+"""
+Background garbage collector for generated challenge folders.
+Removes Alert_<uuid> trees (published or in the warm pool) whose alert no longer exists
+or whose round has ended, evicts the oldest solved trees when a disk/inode budget
+is exceeded, and prunes blobs that no alert tree links to any more. Work is done in small slices on an eventlet
+green thread so it never blocks request handling.
+"""
+
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import eventlet
+from .. import db
+from ..models import Alert, Round
+from .blob_store import BLOB_DIR_NAME
+from .manifest import remove_manifest, MANIFEST_DIR_NAME
+from .ctf_service import get_challenge_base_dir, WARM_DIR_NAME
+
+def _parse_alert_dir(name):
+    """Return the normalized alert UUID for an 'Alert_<uuid>' folder name, or None."""
+    if not name.startswith("Alert_"):
+        return None
+    try:
+        return uuid.UUID(name[len("Alert_"):]).hex
+    except ValueError:
+        return None
+
+def _tree_usage(path):
+    """
+    Bytes and inodes that deleting `path` would actually free.
+    Files hardlinked from the blob store (st_nlink > 1) are shared, so they don't count.
+    """
+    nbytes = 0
+    inodes = 1  # The directory itself
+    for root, dirs, files in os.walk(path):
+        inodes += len(dirs)
+        for fname in files:
+            try:
+                st = os.lstat(os.path.join(root, fname))
+            except OSError:
+                continue
+            if st.st_nlink == 1:
+                nbytes += st.st_size
+                inodes += 1
+    return nbytes, inodes
+
+class ChallengeCollector:
+    """
+    Periodic collector for the challenge base directory.
+
+    Settings (app config):
+        CHALLENGE_GC_ENABLED:     run the background green thread
+        CHALLENGE_GC_INTERVAL:    seconds between passes
+        CHALLENGE_GC_SLICE:       folders handled per slice before yielding
+        CHALLENGE_GC_DRY_RUN:     report what would be removed, delete nothing
+        CHALLENGE_GC_MAX_BYTES:   disk budget for alert trees (None = unlimited)
+        CHALLENGE_GC_MAX_INODES:  inode budget for alert trees (None = unlimited)
+    """
+
+    def __init__(self):
+        self._app = None
+        self._thread = None
+        self.enabled = False
+        self.interval = 300
+        self.slice_size = 50
+        self.dry_run = False
+        self.max_bytes = None
+        self.max_inodes = None
+        self.last_report = None
+        self.runs = 0
+
+    def init_app(self, app):
+        """Read settings and (re)start the background green thread."""
+        cfg = app.config
+        self._app = app
+        self.enabled = cfg.get('CHALLENGE_GC_ENABLED', True)
+        self.interval = cfg.get('CHALLENGE_GC_INTERVAL', self.interval)
+        self.slice_size = cfg.get('CHALLENGE_GC_SLICE', self.slice_size)
+        self.dry_run = cfg.get('CHALLENGE_GC_DRY_RUN', False)
+        self.max_bytes = cfg.get('CHALLENGE_GC_MAX_BYTES')
+        self.max_inodes = cfg.get('CHALLENGE_GC_MAX_INODES')
+        self.last_report = None
+        self.runs = 0
+        if self._thread is not None:
+            self._thread.kill()
+            self._thread = None
+        if self.enabled:
+            self._thread = eventlet.spawn(self._run)
+
+    def _run(self):
+        """Background loop: one collection pass every `interval` seconds."""
+        while True:
+            eventlet.sleep(self.interval)
+            try:
+                self.collect()
+            except Exception:
+                self._app.logger.exception("Challenge garbage collection failed")
+
+    def collect(self, dry_run=None):
+        """
+        Run one full pass and return a report dict.
+        Yields to other green threads after every slice of folders.
+        """
+        dry_run = self.dry_run if dry_run is None else dry_run
+        started = time.perf_counter()
+        report = {'dry_run': dry_run, 'scanned': 0, 'orphaned': 0, 'archived': 0, 'evicted': 0,
+                  'blobs_removed': 0, 'bytes_freed': 0, 'inodes_freed': 0, 'removed': []}
+
+        with self._app.app_context():
+            base_dir = get_challenge_base_dir()
+            if not base_dir.exists():
+                return self._finish(report, started)
+
+            # --- 1) Orphaned trees (no Alert row) and trees of ended rounds ---
+            solved = []  # (solved_at, path) for trees that may be evicted under budget
+            kept = []
+            for batch in self._alert_dir_slices(base_dir):
+                report['scanned'] += len(batch)
+                live = {
+                    uuid.UUID(str(a.uuid)).hex: (a.solved_at, a.ended_at)
+                    for a in db.session.query(Alert.uuid, Alert.solved_at, Round.ended_at)
+                    .outerjoin(Round, Alert.round_id == Round.id)
+                    .filter(Alert.uuid.in_([u for u, _ in batch]))
+                }
+                for alert_uuid, path in batch:
+                    if alert_uuid not in live:
+                        report['orphaned'] += 1
+                        self._remove(path, report, dry_run)
+                    elif live[alert_uuid][1] is not None:
+                        report['archived'] += 1  # Rows stay as the round's archive; the tree can be rebuilt on demand
+                        self._remove(path, report, dry_run)
+                    else:
+                        kept.append(path)
+                        if live[alert_uuid][0] is not None:
+                            solved.append((live[alert_uuid][0], path))
+                db.session.remove()
+                eventlet.sleep(0)  # Let requests run between slices
+
+            # --- 2) Budget: evict the oldest solved trees first ---
+            if self.max_bytes is not None or self.max_inodes is not None:
+                used_bytes = used_inodes = 0
+                for i, path in enumerate(kept):
+                    nbytes, inodes = _tree_usage(path)
+                    used_bytes += nbytes
+                    used_inodes += inodes
+                    if i % self.slice_size == self.slice_size - 1:
+                        eventlet.sleep(0)
+                for i, (_, path) in enumerate(sorted(solved, key=lambda s: s[0] or datetime.min)):
+                    if not self._over_budget(used_bytes, used_inodes):
+                        break
+                    nbytes, inodes = self._remove(path, report, dry_run)
+                    used_bytes -= nbytes
+                    used_inodes -= inodes
+                    report['evicted'] += 1
+                    if i % self.slice_size == self.slice_size - 1:
+                        eventlet.sleep(0)
+                report['used_bytes'] = used_bytes
+                report['used_inodes'] = used_inodes
+
+            # --- 3) Round folders left empty (only rmdir, so a folder still in use is never touched) ---
+            if not dry_run:
+                for directory in base_dir.glob("Round_*"):
+                    for empty in (directory / MANIFEST_DIR_NAME, directory):
+                        try:
+                            empty.rmdir()
+                        except OSError:
+                            break
+
+            # --- 4) Blobs no alert tree links to any more ---
+            blob_root = base_dir / BLOB_DIR_NAME
+            if blob_root.exists() and not dry_run:
+                blobs = (p for p in blob_root.rglob("*") if p.is_file() and p.suffix != ".tmp")  # Skip in-progress writes
+                for i, blob in enumerate(blobs):
+                    try:
+                        st = blob.stat()
+                        if st.st_nlink == 1:
+                            blob.unlink()
+                            report['blobs_removed'] += 1
+                            report['bytes_freed'] += st.st_size
+                            report['inodes_freed'] += 1
+                    except OSError:
+                        pass
+                    if i % self.slice_size == self.slice_size - 1:
+                        eventlet.sleep(0)
+
+        return self._finish(report, started)
+
+    def _alert_dir_slices(self, base_dir):
+        """Yield lists of (alert_uuid, path) for Alert_<uuid> folders (incl. warm ones), `slice_size` at a time."""
+        batch = []
+        for directory in [base_dir, base_dir / WARM_DIR_NAME, *sorted(base_dir.glob("Round_*"))]:
+            if not directory.is_dir():
+                continue
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    alert_uuid = _parse_alert_dir(entry.name)
+                    if alert_uuid is None or not entry.is_dir(follow_symlinks=False):
+                        continue
+                    batch.append((alert_uuid, Path(entry.path)))
+                    if len(batch) >= self.slice_size:
+                        yield batch
+                        batch = []
+        if batch:
+            yield batch
+
+    def _over_budget(self, used_bytes, used_inodes):
+        return ((self.max_bytes is not None and used_bytes > self.max_bytes) or
+                (self.max_inodes is not None and used_inodes > self.max_inodes))
+
+    def _remove(self, path, report, dry_run):
+        """Delete one alert tree (unless dry-run) and account for what it frees."""
+        nbytes, inodes = _tree_usage(path)
+        if not dry_run:
+            shutil.rmtree(path, ignore_errors=True)
+            remove_manifest(path)
+        report['bytes_freed'] += nbytes
+        report['inodes_freed'] += inodes
+        if len(report['removed']) < 100:  # Keep reports small
+            report['removed'].append(path.name)
+        return nbytes, inodes
+
+    def _finish(self, report, started):
+        report['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        report['finished_at'] = datetime.utcnow().isoformat()
+        self.runs += 1
+        self.last_report = report
+        return report
+
+    def stats(self):
+        """Collector settings plus the report from the most recent pass."""
+        return {
+            'enabled': self.enabled,
+            'interval': self.interval,
+            'dry_run': self.dry_run,
+            'max_bytes': self.max_bytes,
+            'max_inodes': self.max_inodes,
+            'runs': self.runs,
+            'last_report': self.last_report,
+        }
+
+# Shared collector instance (initialized in create_app)
+challenge_gc = ChallengeCollector()
@@ -0,0 +1,184 @@
+# --- app/services/challenge_jobs.py ---
+"""
+Background job queue for building challenge folders.
+New alerts are inserted by the request; their Alert_<uuid> trees are written
+by a small, fixed pool of eventlet green threads. Each alert's job status
+(pending / ready / failed) is tracked in memory and an 'alert_ready'
+Socket.IO event is emitted to the alert's event room once its files exist.
+Under eventlet monkey patching the builds themselves run in OS threads
+(eventlet.tpool), so their disk writes never block the hub.
+"""
+
+import time
+from collections import OrderedDict
+
+import eventlet
+from eventlet import tpool
+from eventlet.queue import LightQueue
+from flask import current_app
+from .. import socketio
+from .tree_gen import green_threads
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+def build_challenge(alert_data, alert_uuid, **kwargs):
+    """
+    create_fake_flag_challenge() without stalling the server. Under eventlet
+    monkey patching file I/O doesn't yield, so a build in a green thread would
+    block every request until it finished; there it runs in an OS thread from
+    eventlet.tpool (with this app's context) while the calling green thread waits.
+    """
+    from .ctf_service import create_fake_flag_challenge
+    if not green_threads():
+        return create_fake_flag_challenge(alert_data, alert_uuid, **kwargs)
+    app = current_app._get_current_object()
+
+    def build():
+        with app.app_context():
+            return create_fake_flag_challenge(alert_data, alert_uuid, **kwargs)
+    return tpool.execute(build)
+
+class ChallengeJobQueue:
+    """
+    Bounded worker pool for create_fake_flag_challenge().
+
+    Settings (app config):
+        CHALLENGE_JOBS_ASYNC:        build in the background (False = inside the request)
+        CHALLENGE_JOB_WORKERS:       green threads building trees concurrently
+        CHALLENGE_JOB_STATUS_LIMIT:  job statuses remembered (oldest forgotten first)
+    """
+
+    def __init__(self, workers=4, status_limit=10000):
+        self.workers = workers
+        self.status_limit = status_limit
+        self.async_enabled = True
+        self._app = None
+        self._queue = LightQueue()
+        self._threads = []
+        self._jobs = OrderedDict()  # alert uuid -> status dict
+        self._pending = set()       # alert uuids queued or being built
+        self._reset_stats()
+
+    def init_app(self, app):
+        """Read settings, drop jobs from a previous app and make status available to templates."""
+        self.async_enabled = app.config.get('CHALLENGE_JOBS_ASYNC', True)
+        self.workers = app.config.get('CHALLENGE_JOB_WORKERS', self.workers)
+        self.status_limit = app.config.get('CHALLENGE_JOB_STATUS_LIMIT', self.status_limit)
+        self._app = app
+        for thread in self._threads:
+            thread.kill()
+        self._threads = []
+        self._queue = LightQueue()
+        self._jobs = OrderedDict()
+        self._pending = set()
+        self._reset_stats()
+        app.jinja_env.globals['challenge_status'] = self.status_of
+
+    def _reset_stats(self):
+        self.completed = 0
+        self.failed = 0
+        self.last_build_ms = 0.0
+        self.max_build_ms = 0.0
+
+    def submit(self, alert_uuid, alert_data, base_dir=None, tree=None, room=None):
+        """
+        Queue one challenge tree build and mark it pending.
+        Runs the build immediately when CHALLENGE_JOBS_ASYNC is off.
+        `tree` overrides where the tree is built (e.g. the warm pool); `room` is
+        the Socket.IO room told when it is ready (None: nobody, e.g. warm-pool builds).
+        """
+        self._set_status(alert_uuid, PENDING)
+        job = (alert_uuid, alert_data, base_dir, tree, room)
+        if not self.async_enabled:
+            self._build(*job)
+            return
+        self._ensure_workers()
+        self._queue.put(job)
+
+    def _ensure_workers(self):
+        """Start (or replace dead) worker green threads up to the pool size."""
+        self._threads = [t for t in self._threads if not t.dead]
+        while len(self._threads) < self.workers:
+            self._threads.append(eventlet.spawn(self._run))
+
+    def _run(self):
+        """Worker loop: build queued trees one at a time."""
+        while True:
+            job = self._queue.get()
+            with self._app.app_context():
+                self._build(*job)
+
+    def _build(self, alert_uuid, alert_data, base_dir, tree, room):
+        started = time.perf_counter()
+        try:
+            build_challenge(alert_data, alert_uuid, base_dir=base_dir, tree=tree)
+        except Exception as e:
+            self.failed += 1
+            self._set_status(alert_uuid, FAILED, error=str(e))
+            self._app.logger.exception(f"Building challenge folder for alert {alert_uuid} failed")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.completed += 1
+        self.last_build_ms = round(elapsed_ms, 3)
+        self.max_build_ms = max(self.max_build_ms, self.last_build_ms)
+        self.mark_ready(alert_uuid, room=room)
+
+    def mark_ready(self, alert_uuid, room=None):
+        """Record that an alert's files exist and tell the dashboards in `room` (its event's room), if given."""
+        self._set_status(alert_uuid, READY)
+        if room is not None:
+            socketio.emit('alert_ready', {'uuid': alert_uuid}, to=room)
+
+    def _set_status(self, alert_uuid, status, error=None):
+        job = self._jobs.pop(alert_uuid, None) or {'queued_at': time.time()}
+        job.update(status=status, error=error, updated_at=time.time())
+        if status == PENDING:
+            self._pending.add(alert_uuid)
+        else:
+            self._pending.discard(alert_uuid)
+        self._jobs[alert_uuid] = job
+        while len(self._jobs) > self.status_limit:
+            self._jobs.popitem(last=False)
+
+    def status(self, alert_uuid):
+        """Job status dict for an alert, or None if this process has no record of it."""
+        job = self._jobs.get(alert_uuid)
+        return dict(job, uuid=alert_uuid) if job else None
+
+    def status_of(self, alert_uuid):
+        """Just the status string ('pending', 'ready', 'failed') or None."""
+        job = self._jobs.get(alert_uuid)
+        return job['status'] if job else None
+
+    def join(self, timeout=None):
+        """
+        Yield to the worker green threads until every queued build has finished.
+        Returns True if the queue drained before `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.depth():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            eventlet.sleep(0.001)
+        return True
+
+    def depth(self):
+        """Builds queued or in progress."""
+        return len(self._pending)
+
+    def stats(self):
+        """Pool settings plus counters for /alerts/jobs and /metrics."""
+        return {
+            'async': self.async_enabled,
+            'workers': self.workers,
+            'pending': self.depth(),
+            'completed': self.completed,
+            'failed': self.failed,
+            'last_build_ms': self.last_build_ms,
+            'max_build_ms': self.max_build_ms,
+        }
+
+# Shared job queue instance (initialized in create_app)
+challenge_jobs = ChallengeJobQueue()
@@ -0,0 +1,164 @@
+# --- app/services/cluster.py ---
+"""
+Multi-worker support for Socket.IO and in-process state.
+
+- Picks the Socket.IO client manager from SOCKETIO_MESSAGE_QUEUE
+  (redis://, amqp://, kafka://, zmq+tcp://, or the built-in unix:// broker)
+- Relays small "cluster" events between workers over the same queue, so
+  per-process caches (flag cache, scoreboard, alert-set version) stay in step
+"""
+
+import glob
+import os
+import socket
+
+import socketio as python_socketio
+from .. import socketio
+from . import alert_events
+
+# Namespace used only for worker-to-worker messages (no browser ever joins it)
+CLUSTER_NAMESPACE = '/_cluster'
+
+# Largest datagram the unix:// broker will send (deltas are a few KB)
+MAX_DATAGRAM_SIZE = 200 * 1024
+
+# event name -> handler(data), run on every *other* worker
+_handlers = {}
+
+# True once a message queue is configured (single-process mode skips broadcasts)
+enabled = False
+
+def on(event):
+    """Decorator: run the function on other workers when `event` is broadcast."""
+    def register(fn):
+        _handlers[event] = fn
+        return fn
+    return register
+
+def broadcast(event, data):
+    """Send a cluster event to every other worker (no-op without a message queue)."""
+    if enabled:
+        socketio.emit(event, data, namespace=CLUSTER_NAMESPACE)
+
+class ClusterSyncMixin:
+    """
+    Hooks into a PubSubManager's message handling:
+    - cluster events from other workers are dispatched to registered handlers
+    - relayed 'alerts_delta' emits advance this worker's alert-set version
+    """
+
+    def _handle_emit(self, message):
+        remote = message.get('host_id') != self.host_id
+        if message.get('namespace') == CLUSTER_NAMESPACE:
+            handler = _handlers.get(message.get('event'))
+            if remote and handler:
+                data = message.get('data')
+                handler(data[0] if isinstance(data, list) and len(data) == 1 else data)
+            return  # Never delivered to browsers
+        if remote and message.get('event') == 'alerts_delta':
+            data = message.get('data') or [{}]
+            alert_events.observe_version(data[0].get('version', 0), data[0].get('round'))
+        super()._handle_emit(message)
+
+class UnixSocketManager(ClusterSyncMixin, python_socketio.PubSubManager):
+    """
+    Local stand-in for a message broker: no outside services required.
+
+    Every worker binds a Unix datagram socket in a shared directory
+    (unix:///path/to/dir) and publishing sends the message to every socket
+    found there. Sockets left behind by dead workers are removed on the next send.
+    Only suitable when all workers run on the same host.
+    """
+    name = 'unix'
+
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.directory = url[len('unix://'):] or '/tmp/ctf-socketio'
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{self.channel}-{self.host_id[:12]}.sock")  # AF_UNIX paths max ~108 bytes
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.receiver = None
+        if not write_only:
+            self.receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.receiver.bind(self.path)
+
+    def _peers(self):
+        return [p for p in glob.glob(os.path.join(self.directory, f"{self.channel}-*.sock")) if p != self.path]
+
+    def _publish(self, data):
+        packed = self.json.dumps(data).encode()
+        if len(packed) > MAX_DATAGRAM_SIZE:
+            self._get_logger().error(f"Dropping {len(packed)}-byte Socket.IO message (max {MAX_DATAGRAM_SIZE})")
+            return
+        for peer in self._peers():
+            try:
+                self.sender.sendto(packed, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(peer)  # Worker is gone; clean up its socket
+                except OSError:
+                    pass
+
+    def _listen(self):
+        while True:
+            packet = self.receiver.recv(MAX_DATAGRAM_SIZE)
+            try:
+                yield self.json.loads(packet)
+            except ValueError:
+                continue
+
+    def close(self):
+        """Unbind this worker's socket."""
+        if self.receiver is not None:
+            self.receiver.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+def _manager_class(url):
+    """Map a message queue URL to a python-socketio manager class (with cluster sync)."""
+    if url.startswith('unix://'):
+        return UnixSocketManager
+    if url.startswith(('redis://', 'rediss://')):
+        base = python_socketio.RedisManager
+    elif url.startswith('kafka://'):
+        base = python_socketio.KafkaManager
+    elif url.startswith('zmq'):
+        base = python_socketio.ZmqManager
+    else:
+        base = python_socketio.KombuManager  # amqp:// and anything else Kombu understands
+    return type(f"Cluster{base.__name__}", (ClusterSyncMixin, base), {})
+
+def init_socketio(app):
+    """
+    Initialize the shared SocketIO extension for `app`, attaching a message
+    queue client manager when SOCKETIO_MESSAGE_QUEUE is set.
+    """
+    global enabled
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    socketio.server_options.pop('client_manager', None)  # Don't carry a manager over from a previous app
+    if not url:
+        enabled = False
+        socketio.init_app(app)
+        return
+    channel = app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    manager = _manager_class(url)(url, channel=channel)
+    enabled = True
+    socketio.init_app(app, client_manager=manager)
+
+# --- Cluster event handlers: keep per-process state in step with other workers ---
+
+@on('round_started')
+def _on_round_started(data):
+    from . import rounds
+    from .flag_cache import flag_cache
+    from .scoreboard import scoreboard
+    rounds.observe_round(data['event'], data['round_id'])
+    flag_cache.drop_round(data['previous'])
+    scoreboard.drop(data['previous'])
+
+@on('scoreboard_record')
+def _on_scoreboard_record(data):
+    from .scoreboard import scoreboard
+    scoreboard.record_if_loaded(data['player'], data['points'], data.get('round'))  # Runs outside any app context
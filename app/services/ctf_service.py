@@ -4,32 +4,44 @@ Service layer for CTF logic: creating alerts, planting flags, and generating cha
 This keeps complex business logic out of the route handlers for cleaner code organization.
 """
 
+import hashlib
 import time
 import random
 import uuid
 from pathlib import Path
 import json
+from datetime import datetime
+from flask import current_app, has_app_context
 from .. import db
-from ..models import Alert, Flag
+from ..models import Alert, Flag, generate_uuid
+from .flag_cache import flag_cache
+from .flag_crypto import flag_token, tree_seed
+from .challenge_jobs import challenge_jobs
+from . import rounds
+from .metrics import metrics
+from .blob_store import BlobStore
+from .manifest import ManifestCursor, ManifestWriter, file_entry, is_unchanged
+from .tree_gen import TreeSpec, iter_tree, map_bounded
 
 # Import random filler lines and event difficulty settings
-from app.constants import random_lines, event_difficulty
+from app.constants import event_difficulty
 
-def generate_random_alert():
+def _build_random_alert():
     """
-    Create a new Alert record in the database,
-    build the challenge files on disk,
-    create a Flag record linked to the alert,
-    and return the new alert's UUID.
+    Build (but do not persist) a new Alert with random attributes
+    and its matching Flag. The UUID and creation times are assigned up
+    front so both rows can be inserted together without an intermediate
+    commit, and read afterwards without refreshing them.
     """
-
-    # --- Step 1: Create a database entry for the new alert ---
+    now = datetime.utcnow()
     alert = Alert(
+        uuid=generate_uuid(),
         event_id=random.choice(["4624", "4625", "4740"]),  # Random event code
         user=random.choice(["alice", "bob", "charlie", "diana", "eve"]),  # Random user
         ip=random.choice(["192.168.1.10", "10.0.0.12", "203.0.113.55", "172.16.5.22", "198.51.100.88"]),  # Random IP
         location=random.choice(["New York, USA", "London, UK", "Berlin, Germany", "Tokyo, Japan", "São Paulo, Brazil"]),
-        event_type=None  # Set based on event_id below
+        event_type=None,  # Set based on event_id below
+        time_created=now
     )
 
     # Assign human-readable event type based on event_id
@@ -42,61 +54,224 @@ def generate_random_alert():
     else:
         alert.event_type = "Other"
 
-    db.session.add(alert)
-    db.session.commit()  # Commit to assign UUID
+    flag = Flag(uuid=alert.uuid, value=flag_for(alert.uuid, alert.user, alert.ip), created_at=now)
+    return alert, flag
+
+def flag_for(alert_uuid, user, ip):
+    """
+    Flag string for an alert. The secret per-alert token keeps every flag
+    unique, so a flag alone identifies its alert (flag-only submissions).
+    """
+    return f"FLAG{{{user}_{ip}_{flag_token(alert_uuid)}}}"
+
+def generate_random_alerts(n, published=True, round_id=None):
+    """
+    Create `n` random alerts: insert their Alert and Flag rows in a single
+    transaction, then queue every challenge directory for the background builders.
+    This doesn't bump the alert-set version; callers publishing into a round
+    go through warm_pool.publish() and then publish_alert_delta().
+
+    Published alerts belong to `round_id` (default: the request's current
+    round) and are built under <base>/Round_<id>/. With published=False the
+    alerts are built for the warm pool: in no round yet, hidden from the
+    dashboard, with their trees under <base>/.warm/ until published.
+
+    Returns:
+        List of the new alerts' UUIDs (in creation order)
+    """
+    if n <= 0:
+        return []
 
-    # --- Step 2: Build challenge files on disk ---
-    create_fake_flag_challenge(alert.__dict__, alert.uuid)
+    if published and round_id is None:
+        round_id = rounds.current_round_id()
 
-    # --- Step 3: Create a corresponding flag entry ---
-    flag_value = f"FLAG{{{alert.user}_{alert.ip}}}"  # Create unique flag string
-    flag = Flag(uuid=alert.uuid, value=flag_value)
-    db.session.add(flag)
+    # --- Step 1: Create all Alert + Flag rows with one commit ---
+    # Everything needed afterwards is copied out first: commit expires the
+    # objects, and reading them again would cost one SELECT per row.
+    created = []
+    for alert, flag in (_build_random_alert() for _ in range(n)):
+        alert.published = published
+        alert.round_id = flag.round_id = round_id
+        db.session.add(alert)
+        db.session.add(flag)
+        created.append((alert.uuid, flag.digest, flag.created_at,
+                        {'event_type': alert.event_type, 'user': alert.user, 'ip': alert.ip}))
     db.session.commit()
 
-    return alert.uuid  # Return UUID for further use (e.g., WebSocket notifications)
+    # Warm the flag cache so submit_flag can verify without a DB lookup
+    if published:
+        for alert_uuid, digest, created_at, _ in created:
+            flag_cache.put(alert_uuid, digest, created_at, round_id)
 
-def create_fake_flag_challenge(alert_data, alert_uuid):
+    # --- Step 2: Queue challenge file builds (base dir and room resolved once, while the app context is live) ---
+    base_dir = get_challenge_base_dir()
+    room = rounds.room(rounds.event_of(round_id)) if published else None  # Warm-pool builds aren't announced
+    for alert_uuid, _, _, alert_data in created:
+        tree = alert_tree(alert_uuid, round_id, base_dir) if published else warm_tree(alert_uuid, base_dir)
+        challenge_jobs.submit(alert_uuid, alert_data, base_dir=base_dir, tree=tree, room=room)
+
+    return [alert_uuid for alert_uuid, _, _, _ in created]  # Return UUIDs for further use (e.g., WebSocket notifications)
+
+def get_challenge_base_dir():
     """
-    Build a fake filesystem structure for the challenge.
-    Write hint files across multiple folders and embed the flag into a random file.
+    Return the root directory that holds all Alert_<uuid> challenge folders.
 
-    - Preferably writes to ~/Desktop/CyberHunt/
+    - CHALLENGE_BASE_DIR from the app config, if set
+    - Otherwise ~/Desktop/CyberHunt/
     - If no Desktop, falls back to /generated_challenges/ inside the project directory
     """
-
-    # --- Determine where to store the challenge folders ---
+    configured = current_app.config.get('CHALLENGE_BASE_DIR') if has_app_context() else None
+    if configured:
+        return Path(configured)
     desktop_dir = Path.home() / "Desktop"
     if desktop_dir.exists():
-        base_dir = desktop_dir / "CyberHunt"  # Store challenges under CyberHunt/ folder
-    else:
-        base_dir = Path(__file__).resolve().parent.parent.parent / "generated_challenges"  # Fallback for server deployments
+        return desktop_dir / "CyberHunt"  # Store challenges under CyberHunt/ folder
+    return Path(__file__).resolve().parent.parent.parent / "generated_challenges"  # Fallback for server deployments
 
-    base = base_dir / f"Alert_{alert_uuid}"
-    base.mkdir(parents=True, exist_ok=True)  # Create directory (including parents if needed)
+# Folder (inside the challenge base dir) holding trees of unpublished warm-pool alerts
+WARM_DIR_NAME = ".warm"
+
+def round_dir(round_id, base_dir=None):
+    """Folder holding one round's Alert_<uuid> trees."""
+    return (base_dir or get_challenge_base_dir()) / f"Round_{round_id}"
+
+def alert_tree(alert_uuid, round_id, base_dir=None):
+    """Where a published alert's challenge tree lives (alerts outside any round sit directly under the base dir)."""
+    if round_id is None:
+        return (base_dir or get_challenge_base_dir()) / f"Alert_{alert_uuid}"
+    return round_dir(round_id, base_dir) / f"Alert_{alert_uuid}"
+
+def warm_tree(alert_uuid, base_dir=None):
+    """Where an unpublished alert's challenge tree is built."""
+    return (base_dir or get_challenge_base_dir()) / WARM_DIR_NAME / f"Alert_{alert_uuid}"
+
+def challenge_seed(alert_uuid):
+    """
+    Stable RNG seed for an alert: the same UUID and flag key always yield the
+    same tree, but without the key the flag and decoy positions can't be recomputed.
+    """
+    try:
+        alert_uuid = uuid.UUID(str(alert_uuid)).hex  # Same seed whether or not the UUID has dashes
+    except ValueError:
+        alert_uuid = str(alert_uuid)
+    return tree_seed(alert_uuid)
+
+def tree_spec():
+    """Shape of new challenge trees (CHALLENGE_TREE_* settings; the classic 5 x 3 tree outside an app)."""
+    return TreeSpec.from_config(current_app.config) if has_app_context() else TreeSpec()
+
+def iter_challenge_files(alert_data, alert_uuid, spec=None):
+    """
+    Lazily generate the challenge tree as (relative_path, body, is_flag) tuples.
+    Generation is seeded from a keyed hash of the alert UUID, so it is reproducible.
+    The flag file is picked up front, so no pass over the finished tree is needed.
+    Shared by create_fake_flag_challenge() (writes to disk) and the bundle download (streams).
+    """
+    rng = random.Random(challenge_seed(alert_uuid))
 
     # --- Prepare hint content ---
     hint = event_difficulty.get(alert_data['event_type'], event_difficulty['Other'])['hint']
+    flag = flag_for(alert_uuid, alert_data['user'], alert_data['ip'])
+
+    def decoy(r):
+        """Looks like this alert's flag, but the token is wrong."""
+        return f"FLAG{{{alert_data['user']}_{alert_data['ip']}_{r.getrandbits(48):012x}}}"
+
+    return iter_tree(spec or tree_spec(), rng, hint, flag, decoy)
+
+def create_fake_flag_challenge(alert_data, alert_uuid, base_dir=None, tree=None, spec=None):
+    """
+    Build a fake filesystem structure for the challenge.
+    Write hint files across multiple folders and embed the flag into a random file.
+    The tree's shape comes from `spec` (default: tree_spec()).
+
+    - Writes under get_challenge_base_dir() unless `base_dir` is given
+    - `tree` overrides the Alert_<uuid> folder itself (e.g. a warm-pool tree);
+      the blob store stays under `base_dir`
+    - With CHALLENGE_DEDUP_ENABLED, hint-only files are hardlinked from the
+      shared blob store; only the flag-bearing file is written uniquely
+    - Idempotent: files whose manifest entry still matches on disk (by stat)
+      are left alone, so re-triggering an intact tree writes nothing
+    - Trees of at least CHALLENGE_WRITE_POOL_MIN_FILES files are written by
+      CHALLENGE_WRITE_THREADS threads, with a bounded number of files in flight
+
+    Returns:
+        Dict with the number of files written and left unchanged
+    """
+
+    started = time.perf_counter()
+    written_files = written_bytes = unchanged = 0
+
+    # --- Determine where to store the challenge folders ---
+    if base_dir is None:
+        base_dir = get_challenge_base_dir()
+
+    base = Path(tree) if tree is not None else base_dir / f"Alert_{alert_uuid}"
+    base.mkdir(parents=True, exist_ok=True)  # Create directory (including parents if needed)
+
+    config = current_app.config if has_app_context() else {}
+    dedup = config.get('CHALLENGE_DEDUP_ENABLED', True)
+    blobs = BlobStore(base_dir) if dedup else None
+    spec = spec or tree_spec()
+    workers = config.get('CHALLENGE_WRITE_THREADS', 4) if spec.file_count >= config.get('CHALLENGE_WRITE_POOL_MIN_FILES', 1000) else 1
+    # Old and new manifests are both streamed, so memory stays flat for huge trees
+    previous = ManifestCursor(base)
+    manifest = ManifestWriter(base, alert_uuid)
+
+    def write(item):
+        """Write one file unless it is intact. Returns (rel_path, manifest entry, bytes written or None if unchanged)."""
+        rel_path, body, is_flag, old_entry = item
+        path = base / rel_path
+        data = body.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if is_unchanged(path, old_entry, digest):
+            return rel_path, old_entry, None
+
+        # The flag file is unique, the rest go through the blob store
+        written = len(data)
+        if blobs is not None and not is_flag:
+            if not blobs.place(data, path):
+                written = 0
+        else:
+            if path.exists():
+                path.unlink()  # Never write through a hardlink into a shared blob
+            path.write_bytes(data)
+        return rel_path, file_entry(path, digest), written
+
+    def with_folders(items):
+        """
+        Create each folder and look up each file's old manifest entry (in this
+        thread, in generation order) before the file is handed to the writers.
+        """
+        folder = None
+        for rel_path, body, is_flag in items:
+            parent = (base / rel_path).parent
+            if parent != folder:
+                parent.mkdir(parents=True, exist_ok=True)
+                folder = parent
+            yield rel_path, body, is_flag, previous.entry_for(rel_path)
+
+    # --- Write files as they are generated ---
+    try:
+        for rel_path, entry, written in map_bounded(write, with_folders(iter_challenge_files(alert_data, alert_uuid, spec)), workers):
+            manifest.add(rel_path, entry)
+            if written is None:
+                unchanged += 1
+            else:
+                written_files += 1
+                written_bytes += written
+        # Unchanged tree (every entry came from the old manifest, none left over): keep the old manifest
+        replace = written_files or not previous.at_end()
+    except BaseException:
+        manifest.discard()
+        raise
+    finally:
+        previous.close()
+
+    if replace:
+        manifest.commit()
+    else:
+        manifest.discard()
 
-    # Define folder and file names to simulate logs and system events
-    folders = ["auth_logs", "system_events", "network_traffic", "incident_notes", "user_profiles"]
-    files = ["log.txt", "report.txt", "entry.txt"]
-
-    # --- Create folder structure and files ---
-    for d in folders:
-        p = base / d
-        p.mkdir(exist_ok=True)
-        for fname in files:
-            with open(p / fname, "w") as f:
-                lines = random.sample(random_lines, 3)  # Pick 3 random fake log lines
-                lines.append(f"Hint: {hint}")  # Add real hint to each file
-                random.shuffle(lines)
-                f.write("\n".join(lines))
-
-    # --- Randomly embed the flag into one of the generated files ---
-    all_txt = list(base.rglob("*.txt"))
-    chosen = random.choice(all_txt)  # Pick one .txt file randomly
-    with open(chosen, "a") as f:
-        f.write(f"\n\nFLAG{{{alert_data['user']}_{alert_data['ip']}}}\n")  # Append flag at the bottom
-
-    # (Optional) Future: Write metadata like JSON summaries if needed
+    metrics.observe_challenge_build(time.perf_counter() - started, written_files, written_bytes)
+    return {'written': written_files, 'unchanged': unchanged}
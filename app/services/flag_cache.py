@@ -0,0 +1,87 @@
+# --- app/services/flag_cache.py ---
+"""
+In-process LRU cache of flag digests, keyed by alert UUID (and by digest,
+for flag-only submissions). Lets submit_flag verify guesses without loading
+Alert/Flag rows from the database; no plaintext flag is held in memory.
+"""
+
+import threading
+from collections import OrderedDict
+
+class FlagCache:
+    """
+    Bounded LRU cache mapping alert UUID -> (flag_digest, created_at, round_id),
+    with a digest -> alert UUID index over the same entries.
+
+    - Filled when alerts are published, and on a cache miss in submit_flag
+    - A round's entries are dropped when the round ends
+    - Size is read from FLAG_CACHE_SIZE in the app config
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._by_digest = {}  # flag digest -> alert UUID
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """Read cache size from config and start from an empty cache."""
+        self.maxsize = app.config.get('FLAG_CACHE_SIZE', self.maxsize)
+        self.clear()
+
+    def get(self, alert_uuid):
+        """Return the cached (flag_digest, created_at, round_id) tuple, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(alert_uuid)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(alert_uuid)  # Mark as most recently used
+            self.hits += 1
+            return entry
+
+    def get_by_digest(self, digest):
+        """Return (alert_uuid, entry) for a flag digest, or None on a miss."""
+        with self._lock:
+            alert_uuid = self._by_digest.get(digest)
+        if alert_uuid is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        entry = self.get(alert_uuid)
+        return (alert_uuid, entry) if entry is not None else None
+
+    def put(self, alert_uuid, digest, created_at, round_id=None):
+        """Store a flag digest, evicting the least recently used entry if full. Returns the stored tuple."""
+        entry = (digest, created_at, round_id)
+        with self._lock:
+            previous = self._entries.get(alert_uuid)
+            if previous is not None:
+                self._by_digest.pop(previous[0], None)
+            self._entries[alert_uuid] = entry
+            self._entries.move_to_end(alert_uuid)
+            self._by_digest[digest] = alert_uuid
+            while len(self._entries) > self.maxsize:
+                _, (old_digest, _, _) = self._entries.popitem(last=False)
+                self._by_digest.pop(old_digest, None)
+        return entry
+
+    def clear(self):
+        """Drop every cached flag."""
+        with self._lock:
+            self._entries.clear()
+            self._by_digest.clear()
+
+    def drop_round(self, round_id):
+        """Drop the flags of one round (used when it ends). Bounded by the cache size, not the round's size."""
+        with self._lock:
+            for alert_uuid in [u for u, entry in self._entries.items() if entry[2] == round_id]:
+                self._by_digest.pop(self._entries.pop(alert_uuid)[0], None)
+
+    def __len__(self):
+        return len(self._entries)
+
+# Shared cache instance (initialized in create_app)
+flag_cache = FlagCache()
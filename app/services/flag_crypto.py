@@ -0,0 +1,82 @@
+# --- app/services/flag_crypto.py ---
+"""
+Keyed hashing and encryption at rest for flag values.
+
+- flag_digest(): HMAC-SHA256 of a flag, stored in the indexed Flag.digest
+  column; submissions are verified (and, in flag-only mode, resolved to their
+  alert) by digest, so the plaintext is never needed at submit time
+- encrypt_flag() / decrypt_flag(): the plaintext is stored encrypted with
+  AES-256-GCM (the `cryptography` package), which also authenticates it
+- flag_token(): secret per-alert suffix that keeps flag values unique and
+  unguessable from the alert's public attributes
+- tree_seed(): secret per-alert seed for the challenge tree, so the flag
+  file and decoys can't be located by re-running the generator
+
+All keys are derived from FLAG_SECRET_KEY (falls back to SECRET_KEY).
+Changing that key makes existing flags unreadable and unmatchable. With the
+built-in default key anyone could compute every flag, so outside DEBUG and
+TESTING the app refuses to start with it.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from ..config import DEFAULT_SECRET_KEY
+
+NONCE_SIZE = 12  # 96-bit GCM nonce, random per flag
+
+# Derived keys, set by init_app()
+_keys = {}
+
+def init_app(app):
+    """
+    Derive the digest, encryption and token keys from the configured secret.
+    Raises RuntimeError if that is the built-in default key outside DEBUG/TESTING.
+    """
+    secret = app.config.get('FLAG_SECRET_KEY') or app.config['SECRET_KEY']
+    if secret == DEFAULT_SECRET_KEY:
+        if not (app.config.get('DEBUG') or app.config.get('TESTING')):
+            raise RuntimeError("Refusing to start: flags would be derived from the public default key. "
+                               "Set FLAG_SECRET_KEY or SECRET_KEY.")
+        app.logger.warning("FLAG_SECRET_KEY and SECRET_KEY are unset: flags use the public default key "
+                           "and can be computed by anyone. Never run an event like this.")
+    if isinstance(secret, str):
+        secret = secret.encode('utf-8')
+    for label in ('digest', 'encrypt', 'token', 'tree'):
+        _keys[label] = hmac.new(secret, f"ctf-flag-{label}".encode(), hashlib.sha256).digest()
+
+def _key(label):
+    try:
+        return _keys[label]
+    except KeyError:
+        raise RuntimeError("flag_crypto.init_app() has not been called") from None
+
+def flag_digest(value):
+    """Hex HMAC-SHA256 of a flag value (what the Flag.digest index holds)."""
+    return hmac.new(_key('digest'), value.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def flag_token(alert_uuid):
+    """Secret 12-hex-digit suffix for an alert's flag (stable for the same UUID and key)."""
+    return hmac.new(_key('token'), str(alert_uuid).encode(), hashlib.sha256).hexdigest()[:12]
+
+def tree_seed(alert_uuid):
+    """Secret, stable RNG seed for an alert's challenge tree (hex HMAC of the UUID)."""
+    return hmac.new(_key('tree'), str(alert_uuid).encode(), hashlib.sha256).hexdigest()
+
+def encrypt_flag(value):
+    """Encrypt a flag value; returns URL-safe base64 text (nonce + AES-GCM ciphertext and tag)."""
+    nonce = os.urandom(NONCE_SIZE)
+    return base64.urlsafe_b64encode(nonce + AESGCM(_key('encrypt')).encrypt(nonce, value.encode('utf-8'), None)).decode()
+
+def decrypt_flag(token):
+    """Inverse of encrypt_flag(). Raises ValueError if the text was tampered with or the key changed."""
+    raw = base64.urlsafe_b64decode(token.encode())
+    try:
+        return AESGCM(_key('encrypt')).decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], None).decode('utf-8')
+    except InvalidTag:
+        raise ValueError("Flag ciphertext failed authentication") from None
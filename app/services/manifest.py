@@ -0,0 +1,139 @@
+# --- app/services/manifest.py ---
+"""
+Per-alert manifests of generated challenge files.
+Records each file's relative path, content hash, size and mtime, so a
+rebuild can tell from a stat pass which files are missing or were changed.
+Manifests live outside the alert tree, under <challenge base>/.manifests/.
+
+A manifest is JSON lines: a {"version", "alert"} header, then one
+{"path", "sha256", "size", "mtime_ns"} object per file in generation order,
+so it can be written and read back one entry at a time.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+# Directory (inside the challenge base dir) holding the manifests
+MANIFEST_DIR_NAME = ".manifests"
+
+# Bumped if the manifest layout changes (older manifests are ignored)
+MANIFEST_VERSION = 2
+
+def manifest_path(tree):
+    """Manifest location for an Alert_<uuid> tree."""
+    tree = Path(tree)
+    return tree.parent / MANIFEST_DIR_NAME / f"{tree.name}.json"
+
+def _read_header(fh):
+    """Parse a manifest's header line; None if it is not a current-version manifest."""
+    try:
+        header = json.loads(fh.readline())
+    except ValueError:
+        return None
+    return header if isinstance(header, dict) and header.get('version') == MANIFEST_VERSION else None
+
+def has_manifest(tree):
+    """True if `tree` has a readable, current-version manifest (only its header is read)."""
+    try:
+        with open(manifest_path(tree)) as fh:
+            return _read_header(fh) is not None
+    except OSError:
+        return False
+
+def iter_manifest(tree):
+    """
+    Lazily yield the (relative_path, entry) pairs recorded for `tree`, in
+    generation order. Yields nothing if there is no manifest or it is from
+    another version; stops at the first unreadable line.
+    """
+    try:
+        fh = open(manifest_path(tree))
+    except OSError:
+        return
+    with fh:
+        if _read_header(fh) is None:
+            return
+        for line in fh:
+            try:
+                entry = json.loads(line)
+                rel_path = entry.pop('path')
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return
+            yield rel_path, entry
+
+class ManifestCursor:
+    """
+    Walks a tree's previous manifest alongside a rebuild, one entry per
+    generated file, so the old entries are never all held in memory.
+    A seeded rebuild of the same spec generates files in the order they were
+    recorded; after a spec change the paths stop lining up and the files are
+    simply rewritten.
+    """
+
+    def __init__(self, tree):
+        self._entries = iter_manifest(tree)
+
+    def entry_for(self, rel_path):
+        """The next recorded entry if it is for `rel_path`, else None. Advances one entry either way."""
+        recorded = next(self._entries, None)
+        if recorded is None or recorded[0] != rel_path:
+            return None
+        return recorded[1]
+
+    def at_end(self):
+        """True if no recorded entries are left (called once, after the last entry_for())."""
+        return next(self._entries, None) is None
+
+    def close(self):
+        self._entries.close()
+
+class ManifestWriter:
+    """
+    Streams a manifest to a temporary file one entry at a time, so trees with
+    millions of files never hold their whole manifest in memory. commit()
+    atomically replaces the old manifest; discard() leaves it untouched.
+    """
+
+    def __init__(self, tree, alert_uuid):
+        self.path = manifest_path(tree)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._fh = open(self._tmp, 'w')
+        self._fh.write(json.dumps({'version': MANIFEST_VERSION, 'alert': str(alert_uuid)}) + "\n")
+        self.count = 0
+
+    def add(self, rel_path, entry):
+        self._fh.write(json.dumps(dict(entry, path=rel_path), sort_keys=True) + "\n")
+        self.count += 1
+
+    def commit(self):
+        self._fh.close()
+        os.replace(self._tmp, self.path)
+
+    def discard(self):
+        self._fh.close()
+        self._tmp.unlink(missing_ok=True)
+
+def remove_manifest(tree):
+    """Delete the manifest for `tree`, if any."""
+    try:
+        manifest_path(tree).unlink()
+    except OSError:
+        pass
+
+def file_entry(path, digest):
+    """Manifest entry for a file that was just written."""
+    st = os.stat(path)
+    return {'sha256': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def is_unchanged(path, entry, digest):
+    """True if `path` still holds the content recorded in `entry` (checked by stat only)."""
+    if not entry or entry.get('sha256') != digest:
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_size == entry.get('size') and st.st_mtime_ns == entry.get('mtime_ns')
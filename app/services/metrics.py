@@ -0,0 +1,223 @@
+# --- app/services/metrics.py ---
+"""
+Lightweight in-process instrumentation, exposed in Prometheus text format at /metrics.
+
+Tracks:
+- request latency per endpoint (histogram)
+- SQLAlchemy queries and SQL time per request (histograms)
+- time, files and bytes spent building challenge folders
+"""
+
+import bisect
+import time
+from eventlet.patcher import original
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Default histogram buckets (seconds) for latencies
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for "number of SQL queries in one request"
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative buckets are computed only when rendering)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is the +Inf overflow
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Yield (upper_bound_label, cumulative_count) pairs, ending with +Inf."""
+        running = 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            yield _format_number(bound), running
+        yield "+Inf", running + self.counts[-1]
+
+class Metrics:
+    """
+    Process-wide metrics registry.
+    Disabled entirely (no hooks do any work) when METRICS_ENABLED is False.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._lock = original('threading').Lock()  # A real lock: challenge builds record from OS threads
+        self._histograms = {}  # (name, labels tuple) -> Histogram
+        self._counters = {}    # (name, labels tuple) -> float
+        self._gauge_sources = []  # callables returning [(name, help, labels dict, value)]
+        self._sql_listening = False
+
+    def init_app(self, app):
+        """Install request hooks and SQL listeners according to METRICS_ENABLED."""
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.reset()
+        if not self.enabled:
+            return
+        self.add_gauge_source(default_gauges)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if not self._sql_listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._sql_listening = True
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def add_gauge_source(self, fn):
+        """Register a callable returning [(name, help, labels, value), ...] evaluated at scrape time."""
+        if fn not in self._gauge_sources:
+            self._gauge_sources.append(fn)
+
+    # --- Recording ---
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe_challenge_build(self, seconds, files, nbytes):
+        """Record one create_fake_flag_challenge() call."""
+        self.observe('ctf_challenge_build_seconds', seconds)
+        self.inc('ctf_challenge_files_written_total', files)
+        self.inc('ctf_challenge_bytes_written_total', nbytes)
+
+    # --- Flask / SQLAlchemy hooks ---
+
+    def _start_request(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_sql_queries = 0
+        g._metrics_sql_seconds = 0.0
+
+    def _finish_request(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            self.observe('ctf_request_duration_seconds', time.perf_counter() - start, endpoint=endpoint)
+            self.observe('ctf_request_sql_queries', g.pop('_metrics_sql_queries', 0),
+                         buckets=QUERY_COUNT_BUCKETS, endpoint=endpoint)
+            self.observe('ctf_request_sql_seconds', g.pop('_metrics_sql_seconds', 0.0), endpoint=endpoint)
+            self.inc('ctf_requests_total', endpoint=endpoint, status=str(response.status_code))
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and has_request_context():
+            conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_metrics_query_start')
+        if not starts or not has_request_context():
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if '_metrics_start' in g:
+            g._metrics_sql_queries += 1
+            g._metrics_sql_seconds += elapsed
+
+    # --- Exposition ---
+
+    def render(self):
+        """Return every metric in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            snapshot = [(key, list(h.cumulative()), h.sum, h.count) for key, h in histograms]
+
+        seen = set()
+        for (name, labels), buckets, total, count in snapshot:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            for le, n in buckets:
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {n}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for (name, labels), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+
+        for source in self._gauge_sources:
+            for name, help_text, labels, value in source():
+                if name not in seen:
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} gauge")
+                    seen.add(name)
+                lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+def _format_number(value):
+    """Prometheus-friendly number: integers without a trailing .0."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _escape_label_value(value):
+    """Escape backslashes, quotes and newlines in a label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    """Render a sorted tuple of (name, value) pairs as {name="value",...}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in labels) + "}"
+
+def default_gauges():
+    """Point-in-time values from the in-process caches and queues."""
+    from .flag_cache import flag_cache
+    from .submission_queue import submission_queue
+    from .scoreboard import scoreboard
+    from .blob_store import dedup_stats as dedup
+    from .challenge_jobs import challenge_jobs
+    from .warm_pool import warm_pool
+    from .render_cache import alert_table_cache
+    stats = submission_queue.stats()
+    jobs = challenge_jobs.stats()
+    return [
+        ('ctf_flag_cache_entries', 'Flags held in the verification cache.', {}, len(flag_cache)),
+        ('ctf_flag_cache_hits', 'Flag cache hits since startup.', {}, flag_cache.hits),
+        ('ctf_flag_cache_misses', 'Flag cache misses since startup.', {}, flag_cache.misses),
+        ('ctf_submission_queue_depth', 'Submissions waiting to be written.', {}, stats['depth']),
+        ('ctf_submission_queue_last_flush_ms', 'Duration of the last batch flush.', {}, stats['last_flush_ms']),
+        ('ctf_submission_queue_max_flush_ms', 'Slowest batch flush since startup.', {}, stats['max_flush_ms']),
+        ('ctf_scoreboard_players', 'Players on the scoreboard.', {}, len(scoreboard)),
+        ('ctf_challenge_logical_bytes', 'Bytes of challenge files as seen in alert trees.', {}, dedup.logical_bytes),
+        ('ctf_challenge_physical_bytes', 'Bytes of challenge files actually written.', {}, dedup.physical_bytes),
+        ('ctf_challenge_dedup_ratio', 'Logical / physical challenge bytes.', {}, round(dedup.ratio, 3)),
+        ('ctf_challenge_jobs_pending', 'Challenge folder builds queued or running.', {}, jobs['pending']),
+        ('ctf_challenge_jobs_failed', 'Challenge folder builds that failed since startup.', {}, jobs['failed']),
+        ('ctf_warm_pool_hits', 'Alerts published from the warm pool.', {}, warm_pool.hits),
+        ('ctf_dashboard_cache_hits', 'Dashboard renders served from the alert table cache.', {}, alert_table_cache.hits),
+        ('ctf_dashboard_cache_misses', 'Dashboard renders that queried and rendered the alert table.', {}, alert_table_cache.misses),
+        ('ctf_warm_pool_misses', 'Alerts generated on demand because the warm pool was empty.', {}, warm_pool.misses),
+    ]
+
+# Shared metrics instance (initialized in create_app)
+metrics = Metrics()
@@ -0,0 +1,120 @@
+# --- app/services/rate_limit.py ---
+"""
+In-memory token-bucket rate limiting for flag submissions.
+Sheds brute-force guessing before any database work is done.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key, refilled at `rate` tokens/second up to `burst`.
+
+    Buckets are kept in least-recently-used order; buckets idle for longer
+    than `idle_ttl` seconds (by then they are full again) are dropped, and
+    at most `max_buckets` are kept, so memory stays bounded.
+    """
+
+    def __init__(self, rate, burst, idle_ttl=300, max_buckets=10000):
+        self.rate = rate
+        self.burst = burst
+        self.idle_ttl = idle_ttl
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> [tokens, last_refill_time]
+        self._lock = threading.Lock()
+
+    def acquire(self, key, now=None):
+        """
+        Take one token for `key`.
+
+        Returns:
+            0 if allowed, otherwise the number of seconds until a token is available
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate if self.rate > 0 else float(self.idle_ttl)
+
+    def _expire(self, now):
+        """Drop idle buckets from the LRU end, then enforce the size cap."""
+        while self._buckets:
+            key, (_, last) = next(iter(self._buckets.items()))
+            if now - last < self.idle_ttl and len(self._buckets) < self.max_buckets:
+                break
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+class SubmitRateLimiter:
+    """
+    Rate limits for POST /submit_flag: one bucket per client address and one per alert UUID.
+    Batch submissions draw from a larger per-client bucket, one token per item.
+    Limits are read from the SUBMIT_RATE_* / SUBMIT_BATCH_* settings in the app config.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.per_client = TokenBucketLimiter(rate=5, burst=10)
+        self.per_alert = TokenBucketLimiter(rate=20, burst=40)
+        self.per_client_batch = TokenBucketLimiter(rate=50, burst=200)
+
+    def init_app(self, app):
+        """Build the limiters from config."""
+        cfg = app.config
+        self.enabled = cfg.get('SUBMIT_RATE_LIMIT_ENABLED', True)
+        idle_ttl = cfg.get('SUBMIT_RATE_IDLE_TTL', 300)
+        max_buckets = cfg.get('SUBMIT_RATE_MAX_BUCKETS', 10000)
+        self.per_client = TokenBucketLimiter(cfg.get('SUBMIT_RATE_PER_CLIENT', 5), cfg.get('SUBMIT_BURST_PER_CLIENT', 10),
+                                             idle_ttl, max_buckets)
+        self.per_alert = TokenBucketLimiter(cfg.get('SUBMIT_RATE_PER_ALERT', 20), cfg.get('SUBMIT_BURST_PER_ALERT', 40),
+                                            idle_ttl, max_buckets)
+        self.per_client_batch = TokenBucketLimiter(cfg.get('SUBMIT_BATCH_RATE_PER_CLIENT', 50),
+                                                   cfg.get('SUBMIT_BATCH_BURST_PER_CLIENT', 200),
+                                                   idle_ttl, max_buckets)
+
+    def check(self, client, alert_uuid):
+        """
+        Take one token from the client's bucket and then the alert's bucket
+        (flag-only submissions name no alert and only use the client's).
+
+        Returns:
+            0 if the guess may proceed, otherwise seconds the caller should wait (for Retry-After)
+        """
+        if not self.enabled:
+            return 0
+        return self.per_client.acquire(client) or (alert_uuid is not None and self.per_alert.acquire(alert_uuid))
+
+    def check_batch(self, client, alert_uuids):
+        """
+        check() for each item of a batch submission, against the client's batch bucket.
+
+        Returns:
+            One wait per item (0 = may proceed), in the same order
+        """
+        if not self.enabled:
+            return [0] * len(alert_uuids)
+        now = time.monotonic()
+        return [self.per_client_batch.acquire(client, now)
+                or (alert_uuid is not None and self.per_alert.acquire(alert_uuid, now))
+                for alert_uuid in alert_uuids]
+
+# Shared limiter instance (initialized in create_app)
+submit_limiter = SubmitRateLimiter()
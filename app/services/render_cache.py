@@ -0,0 +1,80 @@
+# --- app/services/render_cache.py ---
+"""
+Versioned cache of the rendered dashboard alert table.
+Entries are keyed by a round's alert-set version tag (see alert_events), which
+is bumped on every create, solve and reset, so between changes GET / is served
+without querying the database. Only the last few versions are kept.
+"""
+
+import threading
+from collections import OrderedDict
+from flask import render_template
+from markupsafe import Markup
+from ..models import Alert
+from .alert_events import version_tag
+from .challenge_jobs import challenge_jobs, PENDING
+
+class AlertTableCache:
+    """
+    Bounded {version tag: rendered rows} map with hit/miss counters.
+
+    Rows of alerts whose challenge folder was still building are rendered with
+    a 'building' marker; an entry is treated as stale once any of those builds
+    has finished, so the marker never outlives the build.
+    """
+
+    def __init__(self, max_versions=8):
+        self.max_versions = max_versions
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # version tag -> (rows html, alert count, pending uuids)
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """Read settings and start empty."""
+        self.enabled = app.config.get('DASHBOARD_CACHE_ENABLED', True)
+        self.max_versions = app.config.get('DASHBOARD_CACHE_VERSIONS', self.max_versions)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, round_id):
+        """
+        Return (rows_html, alert_count, cache_hit) for the round's current alert-set version.
+        Renders from the database on a miss and stores the result.
+        """
+        tag = version_tag(round_id)
+        if self.enabled:
+            with self._lock:
+                entry = self._entries.get(tag)
+                if entry is not None and not any(challenge_jobs.status_of(u) != PENDING for u in entry[2]):
+                    self._entries.move_to_end(tag)
+                    self.hits += 1
+                    return entry[0], entry[1], True
+
+        alerts = Alert.active(round_id).all()
+        rows = Markup("".join(render_template('_alert_row.html', alert=a) for a in alerts))
+        pending = tuple(a.uuid for a in alerts if challenge_jobs.status_of(a.uuid) == PENDING)
+        with self._lock:
+            self.misses += 1
+            if self.enabled:
+                self._entries[tag] = (rows, len(alerts), pending)
+                self._entries.move_to_end(tag)
+                while len(self._entries) > self.max_versions:
+                    self._entries.popitem(last=False)
+        return rows, len(alerts), False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'enabled': self.enabled, 'versions': len(self), 'max_versions': self.max_versions,
+                'hits': self.hits, 'misses': self.misses}
+
+# Shared cache instance (initialized in create_app)
+alert_table_cache = AlertTableCache()
@@ -0,0 +1,109 @@
+# --- app/services/rounds.py ---
+"""
+Events and rounds.
+Each event (e.g. a class) has one current Round; every request works on the
+current round of its event, so several events can run side by side on one
+instance. Resetting an event just ends its round and starts a new one, so the
+cost doesn't grow with history. Old rounds stay in the database as an archive;
+their challenge folders are removed later by the collector.
+"""
+
+import re
+import threading
+from datetime import datetime
+
+from flask import has_request_context, request, session
+from flask_socketio import join_room
+from .. import db, socketio
+from ..models import Round
+from . import cluster
+
+# Event used when a request doesn't name one
+DEFAULT_EVENT = 'default'
+
+# Allowed event names (they appear in URLs, cookies and Socket.IO room names)
+EVENT_NAME_RE = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+# event -> current round id (per process; other workers are told via cluster events)
+_current = {}
+_lock = threading.Lock()
+
+def init_app(app):
+    """Forget cached rounds from a previous app."""
+    with _lock:
+        _current.clear()
+
+def event_name():
+    """
+    Event for the current request: ?event=<name> (remembered in the session),
+    then the session, then DEFAULT_EVENT. Outside a request, DEFAULT_EVENT.
+    """
+    if not has_request_context():
+        return DEFAULT_EVENT
+    requested = request.args.get('event')
+    if requested and EVENT_NAME_RE.match(requested):
+        session['ctf_event'] = requested
+        return requested
+    return session.get('ctf_event') or DEFAULT_EVENT
+
+def room(event):
+    """Socket.IO room that receives an event's dashboard updates."""
+    return f"event:{event}"
+
+def current_round_id(event=None):
+    """Id of the event's current round, creating the first round on demand."""
+    event = event or event_name()
+    round_id = _current.get(event)
+    if round_id is not None:
+        return round_id
+    row = (Round.query.filter_by(event=event, ended_at=None)
+           .order_by(Round.id.desc()).first())
+    if row is None:
+        row = Round(event=event)
+        db.session.add(row)
+        db.session.commit()
+    with _lock:
+        _current[event] = row.id
+    return row.id
+
+def event_of(round_id):
+    """Event a round belongs to (from the cache when possible)."""
+    for event, rid in list(_current.items()):
+        if rid == round_id:
+            return event
+    row = db.session.get(Round, round_id)
+    return row.event if row else DEFAULT_EVENT
+
+def start_round(event=None):
+    """
+    End the event's current round and start a new one: one UPDATE and one INSERT,
+    however many alerts and submissions the old round has.
+
+    Returns:
+        (previous round id or None, new round id)
+    """
+    event = event or event_name()
+    previous = current_round_id(event)
+    Round.query.filter_by(event=event, ended_at=None).update({'ended_at': datetime.utcnow()})
+    row = Round(event=event)
+    db.session.add(row)
+    db.session.commit()
+    observe_round(event, row.id)
+    cluster.broadcast('round_started', {'event': event, 'round_id': row.id, 'previous': previous})
+    return previous, row.id
+
+def observe_round(event, round_id):
+    """Record a new current round for `event` (from this or another worker)."""
+    with _lock:
+        if round_id > _current.get(event, 0):
+            _current[event] = round_id
+
+def rounds_for_event(event=None, limit=50):
+    """Most recent rounds of an event, newest first."""
+    event = event or event_name()
+    return Round.query.filter_by(event=event).order_by(Round.id.desc()).limit(limit).all()
+
+@socketio.on('connect')
+def _join_event_room(auth=None):
+    """Dashboards only receive updates for their own event."""
+    join_room(room(event_name()))
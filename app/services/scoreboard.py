@@ -0,0 +1,162 @@
+# --- app/services/scoreboard.py ---
+"""
+In-memory scoreboard per round, kept up to date incrementally.
+Per-player totals live in a dict plus a sorted list, so a correct submission
+is a couple of bisects instead of an aggregate scan over the submissions table.
+"""
+
+import bisect
+import threading
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from .. import db
+from ..models import Submission
+from . import rounds
+
+class _Board:
+    """Totals and sort order for one round."""
+
+    def __init__(self, totals=None):
+        self.totals = totals or {}  # player -> (points, solves)
+        self.order = sorted((-points, player) for player, (points, _) in self.totals.items())  # (-points, player)
+
+class Scoreboard:
+    """
+    Player totals per round, ordered by score (highest first, ties by player name).
+
+    - rank() and the start of top() are O(log n) bisects
+    - record() is one bisect removal + one bisect insertion
+    - a round's board is rebuilt from its completed submissions the first
+      time it is used in this process (rebuild())
+
+    Every method takes an optional round id; the default is the request's current round.
+    """
+
+    def __init__(self):
+        self._boards = {}  # round id -> _Board
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Start empty; boards are loaded from the database on first use."""
+        self.clear()
+
+    def _board(self, round_id):
+        round_id = round_id or rounds.current_round_id()
+        board = self._boards.get(round_id)
+        if board is None:
+            board = self.rebuild(round_id)
+        return board
+
+    def rebuild(self, round_id=None):
+        """
+        Recompute every player's total in a round from its completed submissions.
+        Each (player, alert) solve counts once, with its best score, however many
+        completed rows the database holds for it.
+        """
+        round_id = round_id or rounds.current_round_id()
+        try:
+            solves = db.session.query(
+                Submission.player.label('player'), func.max(Submission.score).label('score')
+            ).filter(Submission.round_id == round_id, Submission.completed == True
+                     ).group_by(Submission.player, Submission.alert_uuid).subquery()
+            rows = db.session.query(
+                solves.c.player, func.sum(solves.c.score), func.count()
+            ).group_by(solves.c.player).all()
+        except SQLAlchemyError:
+            rows = []  # Tables not created yet (e.g. fresh install or tests)
+        board = _Board({player: (int(points or 0), solves) for player, points, solves in rows})
+        with self._lock:
+            self._boards[round_id] = board
+        return board
+
+    def clear(self):
+        """Forget every board."""
+        with self._lock:
+            self._boards = {}
+
+    def drop(self, round_id):
+        """Forget one round's board (used when the round ends)."""
+        with self._lock:
+            self._boards.pop(round_id, None)
+
+    def record(self, player, points, round_id=None):
+        """
+        Add one solve worth `points` to `player`'s total.
+        Called after the solve is committed: a board not loaded yet is built
+        from the database instead, which already includes this solve.
+        """
+        round_id = round_id or rounds.current_round_id()
+        board = self._boards.get(round_id)
+        if board is None:
+            self.rebuild(round_id)
+            return
+        with self._lock:
+            old_points, solves = board.totals.get(player, (0, 0))
+            if player in board.totals:
+                i = bisect.bisect_left(board.order, (-old_points, player))
+                del board.order[i]
+            new_points = old_points + points
+            board.totals[player] = (new_points, solves + 1)
+            bisect.insort(board.order, (-new_points, player))
+
+    def record_if_loaded(self, player, points, round_id):
+        """
+        record() for a round whose board is already loaded in this process, a
+        no-op otherwise. Needs no app context (no database access), so it is
+        safe for solves relayed from other workers: an unloaded board is built
+        from the database, solve included, when it is first used.
+        """
+        with self._lock:
+            loaded = round_id is not None and round_id in self._boards
+        if loaded:
+            self.record(player, points, round_id)
+
+    def record_many(self, solves, round_id=None):
+        """record() for several (player, points) solves committed together; rebuilds at most once."""
+        round_id = round_id or rounds.current_round_id()
+        if round_id not in self._boards:
+            self.rebuild(round_id)
+            return
+        for player, points in solves:
+            self.record(player, points, round_id)
+
+    def rank(self, player, round_id=None):
+        """1-based rank of `player` (ties share a rank), or None if they have not scored."""
+        board = self._board(round_id)
+        with self._lock:
+            entry = board.totals.get(player)
+            if entry is None:
+                return None
+            return bisect.bisect_left(board.order, (-entry[0],)) + 1
+
+    def entry(self, player, round_id=None):
+        """Scoreboard row for one player, or None if they have not scored."""
+        board = self._board(round_id)
+        rank = self.rank(player, round_id)
+        if rank is None:
+            return None
+        points, solves = board.totals[player]
+        return {'player': player, 'points': points, 'solves': solves, 'rank': rank}
+
+    def top(self, n=10, round_id=None):
+        """The `n` highest-scoring players as scoreboard rows."""
+        board = self._board(round_id)
+        with self._lock:
+            leaders = board.order[:n]
+            result = []
+            for neg_points, player in leaders:
+                rank = bisect.bisect_left(board.order, (neg_points,)) + 1
+                result.append({'player': player, 'points': -neg_points,
+                               'solves': board.totals[player][1], 'rank': rank})
+            return result
+
+    def players(self, round_id=None):
+        """Number of players on a round's board."""
+        return len(self._board(round_id).totals)
+
+    def __len__(self):
+        """Players across every loaded board."""
+        return sum(len(b.totals) for b in list(self._boards.values()))
+
+# Shared scoreboard instance (initialized in create_app)
+scoreboard = Scoreboard()
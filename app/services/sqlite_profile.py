@@ -0,0 +1,42 @@
+# --- app/services/sqlite_profile.py ---
+"""
+Applies a SQLite storage profile (pragmas + connection pool settings) to the app.
+Must run before db.init_app() so the engine is built with the profile's options.
+"""
+
+from sqlalchemy import event
+from ..config import SQLITE_PROFILES
+
+def is_sqlite_file(uri):
+    """True for file-backed SQLite URIs (in-memory databases can't use WAL or a shared pool)."""
+    return bool(uri) and uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') != 'sqlite:'
+
+def configure_sqlite(app):
+    """
+    Merge the selected profile's engine options into SQLALCHEMY_ENGINE_OPTIONS.
+    Options already set explicitly in the config take precedence.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    name = app.config.get('SQLITE_PROFILE', 'default')
+    if name not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{name}', use one of: {', '.join(SQLITE_PROFILES)}")
+    if not is_sqlite_file(uri):
+        return
+    options = dict(SQLITE_PROFILES[name]['engine_options'])
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def install_pragmas(app, engine):
+    """Run the selected profile's PRAGMAs on every new connection of `engine`."""
+    if not is_sqlite_file(app.config.get('SQLALCHEMY_DATABASE_URI')):
+        return
+    pragmas = SQLITE_PROFILES[app.config.get('SQLITE_PROFILE', 'default')]['pragmas']
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        cursor.close()
@@ -0,0 +1,171 @@
+# --- app/services/submission_queue.py ---
+"""
+Write-behind queue for Submission rows.
+Wrong guesses are buffered in memory and inserted in batches by an eventlet
+green thread, so concurrent players don't serialize on SQLite's write lock.
+Correct submissions bypass the buffer (see flush() in submit_flag).
+"""
+
+import atexit
+import time
+from collections import deque
+import eventlet
+from sqlalchemy import insert
+from .. import db
+from ..models import Submission
+from . import analytics
+
+class SubmissionQueue:
+    """
+    Buffers Submission rows and flushes them in one INSERT per batch.
+
+    A batch is flushed when either:
+    - SUBMISSION_BATCH_SIZE rows are pending, or
+    - SUBMISSION_FLUSH_INTERVAL seconds have passed (background green thread)
+
+    Rows still pending when the process exits are flushed by an atexit hook.
+
+    A failed batch is put back and retried by the next flush. After
+    SUBMISSION_MAX_RETRIES consecutive failures its rows are inserted one by
+    one and the ones that still fail are dropped to `dead_letters` (and logged),
+    so a bad row can't block the queue forever. At most SUBMISSION_MAX_PENDING
+    rows are kept waiting; the oldest are dropped beyond that.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, max_retries=3, max_pending=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self._app = None
+        self._pending = []
+        self._flusher = None
+        self._atexit_registered = False
+        self._reset_stats()
+
+    def init_app(self, app):
+        """Read batching thresholds from config and bind the app used for flushing."""
+        self.batch_size = app.config.get('SUBMISSION_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('SUBMISSION_FLUSH_INTERVAL', self.flush_interval)
+        self.max_retries = app.config.get('SUBMISSION_MAX_RETRIES', self.max_retries)
+        self.max_pending = app.config.get('SUBMISSION_MAX_PENDING', self.max_pending)
+        self._app = app
+        self._pending = []
+        self._reset_stats()
+        if not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+
+    def _reset_stats(self):
+        self.failures = 0                      # Consecutive failed flushes
+        self.dropped_rows = 0
+        self.dead_letters = deque(maxlen=100)  # Most recent dropped rows, for inspection
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def enqueue(self, **fields):
+        """Buffer one Submission row (given as column values) for a later batched insert."""
+        self._pending.append(fields)
+        self._ensure_flusher()
+        if len(self._pending) >= self.batch_size:
+            eventlet.spawn_n(self.flush)  # Size threshold reached: flush without blocking this request
+
+    def _ensure_flusher(self):
+        """Start the periodic flush green thread on first use."""
+        if self._flusher is None or self._flusher.dead:
+            self._flusher = eventlet.spawn(self._run)
+
+    def _run(self):
+        """Background loop: flush pending rows every flush_interval seconds."""
+        while True:
+            eventlet.sleep(self.flush_interval)
+            if self._pending:
+                self.flush()
+
+    def flush(self):
+        """
+        Insert every pending row (and its analytics rollup counts) in a single transaction.
+        Returns the number of rows written.
+        """
+        if not self._pending or self._app is None:
+            return 0
+        rows, self._pending = self._pending, []  # Swap buffers so new guesses keep queueing
+
+        start = time.perf_counter()
+        with self._app.app_context():
+            try:
+                self._insert(rows)
+            except Exception:
+                db.session.rollback()
+                self.failures += 1
+                if self.failures > self.max_retries:
+                    self.failures = 0
+                    self._app.logger.exception(f"Failed to flush {len(rows)} queued submissions, "
+                                               f"retrying them one by one")
+                    return self._insert_each(rows)
+                self._pending[:0] = rows  # Put rows back so the next flush retries them
+                overflow = len(self._pending) - self.max_pending
+                if overflow > 0:
+                    self._drop(self._pending[:overflow], "queue full")
+                    del self._pending[:overflow]
+                self._app.logger.exception(f"Failed to flush {len(rows)} queued submissions")
+                return 0
+            self.failures = 0
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushed_rows += len(rows)
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+        return len(rows)
+
+    def _insert(self, rows):
+        db.session.execute(insert(Submission), rows)
+        analytics.record_submissions(rows)
+        db.session.commit()
+
+    def _insert_each(self, rows):
+        """Insert rows in separate transactions, dropping the ones that fail. Returns the number written."""
+        written = 0
+        for row in rows:
+            try:
+                self._insert([row])
+                written += 1
+            except Exception as exc:
+                db.session.rollback()
+                self._drop([row], exc)
+        self.flushed_rows += written
+        return written
+
+    def _drop(self, rows, reason):
+        """Give up on rows: count them, keep the latest for inspection and log."""
+        self.dropped_rows += len(rows)
+        self.dead_letters.extend(rows)
+        self._app.logger.error(f"Dropped {len(rows)} queued submissions ({reason})")
+
+    @property
+    def depth(self):
+        """Number of rows waiting to be written."""
+        return len(self._pending)
+
+    def stats(self):
+        """Queue depth and flush latency numbers for tuning the thresholds."""
+        return {
+            'depth': self.depth,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'flushed_rows': self.flushed_rows,
+            'dropped_rows': self.dropped_rows,
+            'failures': self.failures,
+            'flush_count': self.flush_count,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'max_flush_ms': round(self.max_flush_ms, 3),
+            'avg_flush_ms': round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+        }
+
+# Shared queue instance (initialized in create_app)
+submission_queue = SubmissionQueue()
@@ -0,0 +1,156 @@
+# --- app/services/tree_gen.py ---
+"""
+Procedural generator for challenge trees.
+A TreeSpec describes the shape of an alert's tree (depth, fan-out, files per
+folder, decoy flags, file sizes). iter_tree() walks it lazily, depth-first,
+one file at a time, so trees with 10^5-10^6 files are generated in constant
+memory; the flag and decoy positions are drawn up front from the spec's file
+count instead of by walking the finished tree. map_bounded() runs the writes
+on a small thread pool with a bounded number of files in flight.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from eventlet.patcher import is_monkey_patched
+
+from app.constants import random_lines
+
+# Folder and file names, reused with a numeric suffix when a level needs more.
+# The first five folders and three files make up the classic 5 x 3 tree.
+FOLDER_NAMES = ["auth_logs", "system_events", "network_traffic", "incident_notes", "user_profiles",
+                "dns_queries", "firewall", "proxy_logs", "endpoint_alerts", "mail_gateway"]
+FILE_NAMES = ["log.txt", "report.txt", "entry.txt", "trace.txt", "audit.txt", "notes.txt"]
+
+# Filler lines per file when no file size is configured
+FILLER_LINES = 3
+
+class TreeSpec:
+    """
+    Shape of a challenge tree.
+
+    Every folder on levels 1..depth holds `files_per_dir` files, and every
+    folder above the last level holds `fanout` subfolders. File bodies are
+    FILLER_LINES filler lines plus the hint, or padded with filler lines to a
+    size drawn from [min_size, max_size] bytes when max_size is set. `decoys`
+    files get a flag-shaped string that is not the flag.
+
+    The defaults give the classic tree: 5 folders x 3 files, one level deep.
+    """
+
+    def __init__(self, depth=1, fanout=5, files_per_dir=3, decoys=0, min_size=0, max_size=0):
+        if depth < 1 or fanout < 1 or files_per_dir < 1:
+            raise ValueError("depth, fanout and files_per_dir must be at least 1")
+        if max_size and min_size > max_size:
+            raise ValueError("min_size must not exceed max_size")
+        self.depth = depth
+        self.fanout = fanout
+        self.files_per_dir = files_per_dir
+        self.decoys = decoys
+        self.min_size = min_size
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls, config):
+        """Spec from the CHALLENGE_TREE_* / CHALLENGE_FILE_* settings."""
+        return cls(depth=config.get('CHALLENGE_TREE_DEPTH', 1),
+                   fanout=config.get('CHALLENGE_TREE_FANOUT', 5),
+                   files_per_dir=config.get('CHALLENGE_TREE_FILES_PER_DIR', 3),
+                   decoys=config.get('CHALLENGE_TREE_DECOYS', 0),
+                   min_size=config.get('CHALLENGE_FILE_MIN_BYTES', 0),
+                   max_size=config.get('CHALLENGE_FILE_MAX_BYTES', 0))
+
+    @property
+    def folder_count(self):
+        return sum(self.fanout ** level for level in range(1, self.depth + 1))
+
+    @property
+    def file_count(self):
+        return self.folder_count * self.files_per_dir
+
+    def __repr__(self):
+        return (f"<TreeSpec depth={self.depth} fanout={self.fanout} files_per_dir={self.files_per_dir} "
+                f"decoys={self.decoys} size={self.min_size}-{self.max_size}>")
+
+def _nth_name(pool, i):
+    """i-th unique name from a pool: the pool itself, then name_1, name_2, ... (before any extension)."""
+    name = pool[i % len(pool)]
+    if i < len(pool):
+        return name
+    stem, dot, ext = name.partition('.')
+    return f"{stem}_{i // len(pool)}{dot}{ext}"
+
+def iter_folders(spec, prefix="", level=1):
+    """Relative folder paths of a tree, depth-first (each folder before its subfolders)."""
+    for i in range(spec.fanout):
+        folder = f"{prefix}{_nth_name(FOLDER_NAMES, i)}/"
+        yield folder
+        if level < spec.depth:
+            yield from iter_folders(spec, folder, level + 1)
+
+def iter_tree(spec, rng, hint, flag, decoy=None):
+    """
+    Lazily generate a tree as (relative_path, body, is_flag) tuples.
+
+    Args:
+        spec: TreeSpec
+        rng: seeded random.Random (the same seed always yields the same tree)
+        hint: line added to every file
+        flag: string appended to the one flag file
+        decoy: callable(rng) returning a decoy flag string (needed when spec.decoys > 0)
+    """
+    total = spec.file_count
+    flag_index = rng.randrange(total)
+    decoy_indexes = set()
+    if spec.decoys:
+        # Drawn from the other files: skip over the flag's index
+        decoy_indexes = {i + (i >= flag_index) for i in rng.sample(range(total - 1), min(spec.decoys, total - 1))}
+
+    index = 0
+    for folder in iter_folders(spec):
+        for i in range(spec.files_per_dir):
+            lines = rng.sample(random_lines, FILLER_LINES)  # Random fake log lines
+            if spec.max_size:
+                target, size = rng.randint(spec.min_size, spec.max_size), sum(len(line) + 1 for line in lines)
+                while size < target:
+                    line = rng.choice(random_lines)
+                    lines.append(line)
+                    size += len(line) + 1
+            lines.append(f"Hint: {hint}")  # Real hint in every file
+            rng.shuffle(lines)
+            body = "\n".join(lines)
+            is_flag = index == flag_index
+            if is_flag:
+                body += f"\n\n{flag}\n"  # Flag at the bottom
+            elif index in decoy_indexes:
+                body += f"\n\n{decoy(rng)}\n"
+            yield f"{folder}{_nth_name(FILE_NAMES, i)}", body, is_flag
+            index += 1
+
+def green_threads():
+    """True if eventlet has monkey patched threading (threads are green threads on the hub)."""
+    return is_monkey_patched('thread')
+
+def map_bounded(fn, items, workers=4, max_pending=None):
+    """
+    Apply `fn` to each item on `workers` threads, keeping at most `max_pending`
+    (default 4 per worker) submitted at once, so a lazy `items` iterator is
+    never materialised. Yields results in the order of `items` (so callers can
+    stream them, e.g. into a manifest, in generation order); workers <= 1 runs
+    inline. So does eventlet monkey patching: the pool threads would be green
+    threads, which don't overlap disk writes and can't be started from the OS
+    thread a build runs in (see challenge_jobs.build_challenge()).
+    """
+    if workers <= 1 or green_threads():
+        for item in items:
+            yield fn(item)
+        return
+    max_pending = max_pending or workers * 4
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tree-writer') as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,154 @@
+# --- app/services/warm_pool.py ---
+"""
+Warm pool of pre-built, unpublished alerts.
+Alert/Flag rows (published=False) and their challenge trees under
+<base>/.warm/ are created ahead of time by a background green thread.
+Publishing one is a row update plus a directory rename, so round start
+and respawn after a solve don't wait for alert creation or file writes.
+"""
+
+import os
+from datetime import datetime
+
+import eventlet
+from .. import db
+from ..models import Alert, Flag
+from .challenge_jobs import challenge_jobs
+from .flag_cache import flag_cache
+from .manifest import manifest_path
+from .ctf_service import generate_random_alerts, get_challenge_base_dir, warm_tree, alert_tree
+from . import rounds
+
+class WarmPool:
+    """
+    Keeps up to WARM_POOL_SIZE unpublished alerts ready to go (0 disables the pool).
+
+    Every worker process refills against the same database count, so with
+    several workers the pool can briefly overshoot by a few alerts; it never
+    hands the same alert out twice (publishing is a guarded UPDATE).
+    """
+
+    def __init__(self, size=10):
+        self.size = size
+        self._app = None
+        self._refiller = None
+        self._reset_stats()
+
+    def init_app(self, app):
+        """Read the pool size and stop any refill started for a previous app."""
+        self.size = app.config.get('WARM_POOL_SIZE', self.size)
+        self._app = app
+        if self._refiller is not None:
+            self._refiller.kill()
+            self._refiller = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.hits = 0      # Alerts published from the pool
+        self.misses = 0    # Alerts that had to be generated on demand
+        self.refilled = 0  # Alerts added to the pool
+
+    def publish(self, n, round_id=None):
+        """
+        Publish `n` new alerts into a round (default: the request's current round):
+        take ready ones from the pool first, generate the rest on demand,
+        then schedule a background refill. Callers then bump the round's
+        alert-set version with publish_alert_delta(), so cached tables refresh.
+
+        Returns:
+            List of the published alerts' UUIDs
+        """
+        if n <= 0:
+            return []
+        round_id = round_id or rounds.current_round_id()
+        taken = self.take(n, round_id)
+        fresh = generate_random_alerts(n - len(taken), round_id=round_id)
+        self.misses += len(fresh)
+        self.schedule_refill()
+        return taken + fresh
+
+    def take(self, n, round_id):
+        """Publish up to `n` pooled alerts whose trees are fully built into a round; returns their UUIDs."""
+        if n <= 0 or not self.size:
+            return []
+        base_dir = get_challenge_base_dir()
+        candidates = [u for (u,) in db.session.query(Alert.uuid)
+                      .filter(Alert.published.is_(False))
+                      .order_by(Alert.time_created)
+                      .limit(self.size)]
+        ready = [u for u in candidates if manifest_path(warm_tree(u, base_dir)).exists()]  # Manifest is written last
+
+        now = datetime.utcnow()
+        taken = []
+        for alert_uuid in ready:
+            if len(taken) == n:
+                break
+            # Guarded flip: another worker may have published this alert already
+            if Alert.query.filter_by(uuid=alert_uuid, published=False).update(
+                    {'published': True, 'time_created': now, 'round_id': round_id}):
+                taken.append(alert_uuid)
+        if not taken:
+            db.session.rollback()
+            return []
+        # Scoring counts from when the alert goes live, not from when it was pooled
+        Flag.query.filter(Flag.uuid.in_(taken)).update({'created_at': now, 'round_id': round_id},
+                                                       synchronize_session=False)
+        db.session.commit()
+
+        for flag in Flag.query.filter(Flag.uuid.in_(taken)):
+            flag_cache.put(flag.uuid, flag.digest, flag.created_at, round_id)
+        for alert_uuid in taken:
+            self._move_into_place(alert_uuid, round_id, base_dir)
+        self.hits += len(taken)
+        return taken
+
+    def _move_into_place(self, alert_uuid, round_id, base_dir):
+        """Rename the warm tree (and its manifest) to its published location in the round's folder."""
+        src = warm_tree(alert_uuid, base_dir)
+        dst = alert_tree(alert_uuid, round_id, base_dir)
+        room = rounds.room(rounds.event_of(round_id))
+        try:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(src, dst)
+            manifest_path(dst).parent.mkdir(exist_ok=True)
+            os.replace(manifest_path(src), manifest_path(dst))
+        except OSError:
+            # Rename failed (e.g. a tree was rebuilt in place meanwhile): build it where it belongs
+            alert = db.session.get(Alert, alert_uuid)
+            self._app.logger.warning(f"Could not publish warm tree for alert {alert_uuid}, rebuilding")
+            challenge_jobs.submit(alert_uuid, {'event_type': alert.event_type, 'user': alert.user, 'ip': alert.ip},
+                                  base_dir=base_dir, tree=dst, room=room)
+            return
+        challenge_jobs.mark_ready(alert_uuid, room=room)
+
+    def schedule_refill(self):
+        """Top the pool up in a background green thread (at most one running per process)."""
+        if not self.size or self._app is None:
+            return
+        if self._refiller is None or self._refiller.dead:
+            self._refiller = eventlet.spawn(self._refill_in_background)
+
+    def _refill_in_background(self):
+        with self._app.app_context():
+            try:
+                self.refill()
+            except Exception:
+                self._app.logger.exception("Warm pool refill failed")
+            finally:
+                db.session.remove()
+
+    def refill(self):
+        """Create unpublished alerts until the pool holds `size` of them. Returns how many were added."""
+        missing = self.size - Alert.query.filter(Alert.published.is_(False)).count()
+        if missing <= 0:
+            return 0
+        generate_random_alerts(missing, published=False)
+        self.refilled += missing
+        return missing
+
+    def stats(self):
+        """Pool size and hit/miss counters."""
+        return {'size': self.size, 'hits': self.hits, 'misses': self.misses, 'refilled': self.refilled}
+
+# Shared warm pool instance (initialized in create_app)
+warm_pool = WarmPool()
@@ -2,14 +2,92 @@
 // JavaScript to handle real-time alert updates and flag form submissions
 
 // Initialize Socket.IO for live alert push
-const socket = io();
+// (WebSocket only, so it works behind several workers without sticky sessions)
+const socket = io({ transports: ['websocket'] });
 
-// Listen for "new_alert" events from server via WebSocket
-socket.on('new_alert', ({ uuid }) => {
-  // When a new alert is pushed, reload the page (simple method)
-  window.location.reload();
+// Alert-set version this page currently reflects (set from the server-rendered table)
+let alertsVersion = 0;
+
+// Build a <tr> element from server-rendered row HTML
+function rowFromHtml(html) {
+  const tpl = document.createElement('template');
+  tpl.innerHTML = html.trim();
+  return tpl.content.querySelector('tr');
+}
+
+// Insert a rendered alert row (skipped if the row is already on the page)
+function addAlertRow(tbody, { uuid, html }) {
+  if (tbody.querySelector(`tr[data-uuid="${uuid}"]`)) return;
+  const row = rowFromHtml(html);
+  tbody.appendChild(row);
+  row.querySelectorAll('.submit-form').forEach(handleSubmitForm);
+}
+
+// Mark an alert row as solved (kept visible so the solver still sees the result)
+function markSolved(tbody, uuid) {
+  const row = tbody.querySelector(`tr[data-uuid="${uuid}"]`);
+  if (!row) return;
+  row.classList.add('solved');
+  row.querySelectorAll('button').forEach((b) => { b.disabled = true; });
+}
+
+// Remove an alert row from the table
+function removeAlertRow(tbody, uuid) {
+  const row = tbody.querySelector(`tr[data-uuid="${uuid}"]`);
+  if (row) row.remove();
+}
+
+// Fetch the full active-alert table and replace the current rows
+async function resyncAlerts() {
+  const tbody = document.getElementById('alerts-body');
+  try {
+    const response = await fetch('/alerts/active', { headers: { 'Accept': 'application/json' } });
+    const data = await response.json();
+    tbody.innerHTML = '';
+    data.alerts.forEach((row) => addAlertRow(tbody, row));
+    alertsVersion = data.version;
+  } catch (err) {
+    console.error('Resync error', err);
+  }
+}
+
+// Listen for "alerts_delta" events from server via WebSocket and patch the table in place
+socket.on('alerts_delta', (delta) => {
+  const tbody = document.getElementById('alerts-body');
+  if (delta.version <= alertsVersion) return; // Already applied (e.g. via a resync)
+  if (!delta.reset && delta.previous !== alertsVersion) {
+    // Missed one or more deltas for this round: fetch the full table instead
+    resyncAlerts();
+    return;
+  }
+
+  if (delta.reset) tbody.innerHTML = '';
+  delta.removed.forEach((uuid) => removeAlertRow(tbody, uuid));
+  delta.solved.forEach((uuid) => markSolved(tbody, uuid));
+  delta.added.forEach((row) => addAlertRow(tbody, row));
+  alertsVersion = delta.version;
+});
+
+// Listen for "alert_ready" events: the alert's challenge folder has been built
+socket.on('alert_ready', ({ uuid }) => {
+  const row = document.querySelector(`#alerts-body tr[data-uuid="${uuid}"]`);
+  if (row) row.classList.remove('building');
 });
 
+// Render the scoreboard list from a list of {player, points, rank} rows
+function renderScoreboard(top) {
+  const list = document.getElementById('scoreboard');
+  list.innerHTML = '';
+  top.forEach(({ player, points }) => {
+    const item = document.createElement('li');
+    item.textContent = `${player} — ${points} pts`;
+    list.appendChild(item);
+  });
+}
+
+// Listen for "scoreboard" events pushed after every correct submission
+socket.on('scoreboard', ({ top }) => renderScoreboard(top));
+
 // Function to handle submitting a flag for an alert
 function handleSubmitForm(form) {
   form.addEventListener('submit', async (e) => {
@@ -28,7 +106,7 @@ function handleSubmitForm(form) {
           'Content-Type': 'application/json',
           'Accept': 'application/json'
         },
-        body: JSON.stringify({ uuid, flag })
+        body: JSON.stringify({ uuid, flag, player: document.getElementById('player-name').value })
       });
       const data = await response.json();
 
@@ -50,13 +128,17 @@ function handleSubmitForm(form) {
 
 // Attach event listeners to all forms once page loads
 document.addEventListener('DOMContentLoaded', () => {
-  // Attach to existing forms
+  const tbody = document.getElementById('alerts-body');
+  alertsVersion = parseInt(tbody.dataset.version, 10) || 0;
+
+  // Attach to existing forms (rows added later via deltas are wired up in addAlertRow)
   document.querySelectorAll('.submit-form').forEach(handleSubmitForm);
 
-  // Delegate form handlers for any new alerts dynamically added via WebSocket
-  document.getElementById('alerts-body').addEventListener('submit', (e) => {
-    if (e.target.classList.contains('submit-form')) {
-      handleSubmitForm(e.target);
-    }
-  });
+  // Remember the player's name between visits
+  const playerInput = document.getElementById('player-name');
+  playerInput.value = localStorage.getItem('playerName') || '';
+  playerInput.addEventListener('change', () => localStorage.setItem('playerName', playerInput.value));
+
+  // Load the current scoreboard once; live updates arrive over Socket.IO
+  fetch('/scoreboard').then((r) => r.json()).then((data) => renderScoreboard(data.top));
 });
@@ -0,0 +1,186 @@
+# --- benchmarks/bench_app.py ---
+# Micro-benchmarks and a simple load test for the CTF Dashboard hot paths.
+# Builds the app with create_app() against a temporary SQLite database and a
+# temporary challenge directory, seeds N alerts and M submissions, then times
+# each route / service call and writes the results as JSON.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_app --alerts 200 --submissions 10000 --iterations 500 --output bench.json
+#   python -m benchmarks.bench_app --output new.json --compare bench.json
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.config import Config
+from app.models import Alert, Flag, Submission, generate_uuid
+from app.services import rounds
+from app.services.ctf_service import generate_random_alerts, create_fake_flag_challenge
+from app.services.submission_queue import submission_queue
+from app.services.warm_pool import warm_pool
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def summarize(name, durations):
+    """Turn a list of per-call durations (seconds) into throughput and latency stats."""
+    durations = sorted(durations)
+    total = sum(durations)
+    return {
+        'name': name,
+        'count': len(durations),
+        'total_s': round(total, 6),
+        'throughput_per_s': round(len(durations) / total, 2) if total else 0.0,
+        'mean_ms': round(total / len(durations) * 1000, 3) if durations else 0.0,
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3),
+        'max_ms': round(durations[-1] * 1000, 3) if durations else 0.0,
+    }
+
+def timed(fn, iterations):
+    """Call `fn` `iterations` times and return the individual durations."""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def make_config(workdir, **overrides):
+    """Benchmark config: temp DB + temp challenge dir, rate limiting off."""
+    attrs = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{workdir / 'bench.db'}",
+        'CHALLENGE_BASE_DIR': str(workdir / 'challenges'),
+        'SUBMIT_RATE_LIMIT_ENABLED': False,
+        'MAX_ALERTS': 0,  # Don't respawn alerts when a flag is solved
+    }
+    attrs.update(overrides)
+    return type('BenchmarkConfig', (Config,), attrs)
+
+def seed(n_alerts, n_submissions):
+    """Create `n_alerts` alerts and `n_submissions` wrong-guess submissions spread across them."""
+    uuids = generate_random_alerts(n_alerts)
+    rows = [{
+        'alert_uuid': random.choice(uuids),
+        'player': f"player{i % 50}",
+        'submitted_value': 'FLAG{wrong}',
+        'score': 0,
+        'completed': False,
+        'timestamp': datetime.utcnow(),
+    } for i in range(n_submissions)]
+    for i in range(0, len(rows), 5000):
+        db.session.execute(insert(Submission), rows[i:i + 5000])
+    db.session.commit()
+    return uuids
+
+def run_benchmarks(alerts=100, submissions=1000, iterations=200, config_overrides=None):
+    """
+    Run every benchmark and return a machine-readable results dict.
+
+    Args:
+        alerts: number of alerts to seed
+        submissions: number of submissions to seed
+        iterations: calls per benchmark
+        config_overrides: extra config values for create_app (e.g. to compare settings)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        app = create_app(make_config(workdir, **(config_overrides or {})))
+        results = []
+
+        with app.app_context():
+            db.create_all()
+            uuids = seed(alerts, submissions)
+            flags = {f.uuid: f.value for f in Flag.query.all()}
+            client = app.test_client()
+
+            # --- HTTP routes ---
+            results.append(summarize('GET /', timed(lambda: client.get('/'), iterations)))
+            results.append(summarize('GET /alerts/list', timed(lambda: client.get('/alerts/list'), iterations)))
+
+            def wrong_guess():
+                client.post('/submit_flag', json={'uuid': random.choice(uuids), 'flag': 'FLAG{nope}'})
+            results.append(summarize('POST /submit_flag (wrong)', timed(wrong_guess, iterations)))
+            submission_queue.flush()
+
+            unsolved = list(uuids)
+            random.shuffle(unsolved)
+
+            def correct_guess():
+                u = unsolved.pop()
+                client.post('/submit_flag', json={'uuid': u, 'flag': flags[u]})
+            results.append(summarize('POST /submit_flag (correct)', timed(correct_guess, min(iterations, len(unsolved)))))
+
+            # --- Service calls ---
+            round_id = rounds.current_round_id()
+            results.append(summarize('warm_pool.publish', timed(lambda: warm_pool.publish(1, round_id), iterations)))
+
+            sample = Alert.query.first()
+            alert_data = {'event_type': sample.event_type, 'user': sample.user, 'ip': sample.ip}
+            # A fresh UUID per call builds a whole new tree; re-running one UUID only checks an intact tree
+            results.append(summarize('create_fake_flag_challenge',
+                                     timed(lambda: create_fake_flag_challenge(alert_data, generate_uuid()), iterations)))
+            create_fake_flag_challenge(alert_data, sample.uuid)
+            results.append(summarize('create_fake_flag_challenge (no-op rebuild)',
+                                     timed(lambda: create_fake_flag_challenge(alert_data, sample.uuid), iterations)))
+
+            db.session.remove()
+            db.drop_all()
+
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'alerts': alerts, 'submissions': submissions, 'iterations': iterations,
+                   'config_overrides': config_overrides or {}},
+        'results': results,
+    }
+
+def compare(old, new):
+    """Print p50/p99/throughput changes between two result files."""
+    old_by_name = {r['name']: r for r in old['results']}
+    print(f"{'benchmark':44} {'p50 ms':>18} {'p99 ms':>18} {'ops/s':>20}")
+    for r in new['results']:
+        o = old_by_name.get(r['name'])
+        if not o:
+            continue
+        print(f"{r['name']:44} "
+              f"{o['p50_ms']:>8.3f} -> {r['p50_ms']:<7.3f} "
+              f"{o['p99_ms']:>8.3f} -> {r['p99_ms']:<7.3f} "
+              f"{o['throughput_per_s']:>9.1f} -> {r['throughput_per_s']:<8.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CTF Dashboard hot paths.")
+    parser.add_argument('--alerts', type=int, default=100, help="alerts to seed (default 100)")
+    parser.add_argument('--submissions', type=int, default=1000, help="submissions to seed (default 1000)")
+    parser.add_argument('--iterations', type=int, default=200, help="calls per benchmark (default 200)")
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="previous JSON results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.alerts, args.submissions, args.iterations)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), results)
+
+if __name__ == '__main__':
+    sys.exit(main())
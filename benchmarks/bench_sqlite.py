@@ -0,0 +1,131 @@
+# --- benchmarks/bench_sqlite.py ---
+# Concurrent-submission throughput under each SQLite profile (see SQLITE_PROFILES).
+# Spawns N threads that each submit correct flags (writes) while M threads load the
+# dashboard (reads), and reports throughput, latency and "database is locked" errors.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_sqlite --alerts 400 --writers 8 --readers 4 --output sqlite.json
+#   python -m benchmarks.bench_sqlite --profiles production
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.config import SQLITE_PROFILES
+from app.models import Flag
+from app.services.ctf_service import generate_random_alerts
+from .bench_app import make_config, summarize
+
+def run_profile(profile, alerts=400, writers=8, readers=4):
+    """Run one concurrent load pass with `profile` and return its stats."""
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        app = create_app(make_config(workdir, SQLITE_PROFILE=profile, CHALLENGE_GC_ENABLED=False))
+        with app.app_context():
+            db.create_all()
+            generate_random_alerts(alerts)
+            todo = [(f.uuid, f.value) for f in Flag.query.all()]
+            db.session.remove()
+
+        lock = threading.Lock()
+        write_times, read_times = [], []
+        errors = {'locked': 0, 'other': 0}
+        done = threading.Event()
+
+        def writer():
+            client = app.test_client()
+            while True:
+                with lock:
+                    if not todo:
+                        return
+                    alert_uuid, value = todo.pop()
+                start = time.perf_counter()
+                try:
+                    rv = client.post('/submit_flag', json={'uuid': alert_uuid, 'flag': value})
+                    ok = rv.status_code < 500
+                except OperationalError as exc:
+                    ok = False
+                    with lock:
+                        errors['locked' if 'locked' in str(exc) else 'other'] += 1
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        write_times.append(elapsed)
+
+        def reader():
+            client = app.test_client()
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    client.get('/')
+                except OperationalError:
+                    with lock:
+                        errors['locked'] += 1
+                    continue
+                with lock:
+                    read_times.append(time.perf_counter() - start)
+
+        reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+        writer_threads = [threading.Thread(target=writer) for _ in range(writers)]
+        started = time.perf_counter()
+        for t in reader_threads + writer_threads:
+            t.start()
+        for t in writer_threads:
+            t.join()
+        wall = time.perf_counter() - started
+        done.set()
+        for t in reader_threads:
+            t.join()
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    writes = summarize(f'POST /submit_flag ({profile})', write_times)
+    reads = summarize(f'GET / ({profile})', read_times)
+    # Per-call throughput hides concurrency, so report wall-clock rates as well
+    writes['wall_s'] = reads['wall_s'] = round(wall, 3)
+    writes['wall_throughput_per_s'] = round(len(write_times) / wall, 2) if wall else 0.0
+    reads['wall_throughput_per_s'] = round(len(read_times) / wall, 2) if wall else 0.0
+    return {'profile': profile, 'errors': errors, 'results': [writes, reads]}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare SQLite profiles under concurrent submissions.")
+    parser.add_argument('--alerts', type=int, default=400, help="alerts (= correct submissions) per run (default 400)")
+    parser.add_argument('--writers', type=int, default=8, help="concurrent submitting threads (default 8)")
+    parser.add_argument('--readers', type=int, default=4, help="concurrent dashboard threads (default 4)")
+    parser.add_argument('--profiles', nargs='+', default=list(SQLITE_PROFILES), help="profiles to run")
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    runs = [run_profile(p, args.alerts, args.writers, args.readers) for p in args.profiles]
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'alerts': args.alerts, 'writers': args.writers, 'readers': args.readers},
+        'runs': runs,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+    print(f"{'profile':12} {'writes/s':>10} {'write p99 ms':>13} {'reads/s':>10} {'locked':>7}", file=sys.stderr)
+    for run in runs:
+        w, r = run['results']
+        print(f"{run['profile']:12} {w['wall_throughput_per_s']:>10.1f} {w['p99_ms']:>13.3f} "
+              f"{r['wall_throughput_per_s']:>10.1f} {run['errors']['locked']:>7}", file=sys.stderr)
+
+if __name__ == '__main__':
+    sys.exit(main())
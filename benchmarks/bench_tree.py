@@ -0,0 +1,142 @@
+# --- benchmarks/bench_tree.py ---
+# Files/second of the challenge-tree generator at different tree sizes.
+# Each spec is built once with a single writer and once per --threads value,
+# into a temporary challenge directory, and reports files/s, MB/s and the
+# process's peak RSS (which should stay flat as trees grow). Builds run on a
+# green thread, as in the job pool, while another green thread measures the
+# longest stall of the eventlet hub (how long every request would wait).
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_tree --output tree.json
+#   python -m benchmarks.bench_tree --specs 3x10x10 4x10x10 --threads 4 8 --no-dedup
+#   python -m benchmarks.bench_tree --eventlet   # Monkey patched, as under manage.py / gunicorn -k eventlet
+#
+# A spec is DEPTHxFANOUTxFILES_PER_DIR: 3x10x10 = 11,100 files, 4x10x10 = 111,100,
+# 5x10x10 = 1,111,100.
+
+import sys
+
+if '--eventlet' in sys.argv:  # Patch before anything imports threading, as manage.py does
+    import eventlet
+    eventlet.monkey_patch()
+
+import argparse
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import eventlet
+
+from app import create_app
+from app.services.challenge_jobs import build_challenge
+from app.services.tree_gen import TreeSpec, green_threads
+from .bench_app import make_config
+
+DEFAULT_SPECS = ['1x5x3', '2x10x10', '3x10x10']
+
+def parse_spec(text, decoys=0, max_size=0):
+    """'DEPTHxFANOUTxFILES' -> TreeSpec."""
+    depth, fanout, files_per_dir = (int(part) for part in text.lower().split('x'))
+    return TreeSpec(depth=depth, fanout=fanout, files_per_dir=files_per_dir, decoys=decoys,
+                    min_size=max_size // 2, max_size=max_size)
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def build_on_green_thread(app, alert_data, spec):
+    """Build the tree on a green thread, as the job pool does; return (result, longest hub stall in ms)."""
+    tick, stall = 0.01, [0.0]
+
+    def ticker():
+        last = time.perf_counter()
+        while True:
+            eventlet.sleep(tick)
+            now = time.perf_counter()
+            stall[0] = max(stall[0], now - last - tick)
+            last = now
+
+    def build():
+        with app.app_context():
+            return build_challenge(alert_data, 'bench', spec=spec)
+
+    watcher = eventlet.spawn(ticker)
+    eventlet.sleep(0)  # Let the ticker start before the build takes the hub
+    try:
+        result = eventlet.spawn(build).wait()
+    finally:
+        watcher.kill()
+    return result, round(stall[0] * 1000, 1)
+
+def run_spec(spec, threads, dedup=True):
+    """Build one tree with `spec` and `threads` writers; return throughput stats."""
+    alert_data = {'event_type': 'Failed Login', 'user': 'alice', 'ip': '10.0.0.12'}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        app = create_app(make_config(workdir, CHALLENGE_DEDUP_ENABLED=dedup, CHALLENGE_WRITE_THREADS=threads,
+                                     CHALLENGE_WRITE_POOL_MIN_FILES=1, CHALLENGE_GC_ENABLED=False))
+        start = time.perf_counter()
+        result, stall_ms = build_on_green_thread(app, alert_data, spec)
+        elapsed = time.perf_counter() - start
+        peak = peak_rss_mb()  # Before the size pass below
+        written_bytes = sum(os.path.getsize(os.path.join(root, name))
+                            for root, _, names in os.walk(workdir / 'challenges' / 'Alert_bench') for name in names)
+    return {
+        'spec': repr(spec),
+        'files': spec.file_count,
+        'threads': threads,
+        'dedup': dedup,
+        'eventlet': green_threads(),
+        'max_stall_ms': stall_ms,
+        'written': result['written'],
+        'seconds': round(elapsed, 3),
+        'files_per_s': round(spec.file_count / elapsed, 1) if elapsed else 0.0,
+        'mb_per_s': round(written_bytes / elapsed / 1e6, 2) if elapsed else 0.0,
+        'peak_rss_mb': peak,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark challenge-tree generation throughput.")
+    parser.add_argument('--specs', nargs='+', default=DEFAULT_SPECS, help="DEPTHxFANOUTxFILES specs (default: %(default)s)")
+    parser.add_argument('--threads', nargs='+', type=int, default=[4], help="writer thread counts to compare with 1 (default 4)")
+    parser.add_argument('--decoys', type=int, default=0, help="decoy flags per tree (default 0)")
+    parser.add_argument('--max-size', type=int, default=0, help="max file size in bytes (default: three filler lines)")
+    parser.add_argument('--no-dedup', action='store_true', help="write every file instead of hardlinking blobs")
+    parser.add_argument('--eventlet', action='store_true', help="monkey patch with eventlet first, like the server")
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for text in args.specs:
+        spec = parse_spec(text, args.decoys, args.max_size)
+        for threads in [1] + [t for t in args.threads if t != 1]:
+            runs.append(run_spec(spec, threads, dedup=not args.no_dedup))
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'specs': args.specs, 'threads': args.threads, 'decoys': args.decoys,
+                   'max_size': args.max_size, 'dedup': not args.no_dedup, 'eventlet': args.eventlet},
+        'runs': runs,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+    print(f"{'files':>10} {'threads':>8} {'files/s':>10} {'MB/s':>8} {'peak RSS MB':>12} {'max stall ms':>13}",
+          file=sys.stderr)
+    for run in runs:
+        print(f"{run['files']:>10} {run['threads']:>8} {run['files_per_s']:>10.1f} {run['mb_per_s']:>8.2f} "
+              f"{run['peak_rss_mb']:>12.1f} {run['max_stall_ms']:>13.1f}", file=sys.stderr)
+
+if __name__ == '__main__':
+    sys.exit(main())
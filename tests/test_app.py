@@ -7,6 +7,7 @@ import tempfile
 import pytest
 from app import create_app, db
 from app.models import Alert, Flag, Submission
+from app.services.submission_queue import submission_queue
 
 @pytest.fixture
 def client(tmp_path, monkeypatch):
@@ -15,12 +16,19 @@ def client(tmp_path, monkeypatch):
     monkeypatch.setenv("DEV_DATABASE_URL", f"sqlite:///{db_file}")  # Override DB for test only
     app = create_app()
     app.config["TESTING"] = True  # Enable testing mode (no error catching)
+    app.config["CHALLENGE_BASE_DIR"] = str(tmp_path / "challenges")  # Keep generated files out of the repo
 
     with app.app_context():
         db.create_all()  # Initialize tables
         yield app.test_client()  # Provide test client to tests
+        submission_queue.flush()  # Write out queued guesses before their tables go away
         db.drop_all()  # Clean up after test
 
+def tree_of(alert_uuid):
+    """Challenge folder of a published alert (inside its round's folder)."""
+    from app.services.ctf_service import alert_tree
+    return alert_tree(alert_uuid, db.session.query(Alert.round_id).filter_by(uuid=alert_uuid).scalar())
+
 def test_dashboard_empty(client):
     """Test: GET / should return 200 and show no alerts initially."""
     rv = client.get("/")
@@ -70,3 +78,628 @@ def test_reset_ctf(client):
     client.post("/alerts/create")
     rv = client.post("/reset_ctf")
     assert rv.status_code == 302  # Redirect after reset
+
+def test_generate_random_alerts_batch(client):
+    """Test: generate_random_alerts(n) creates n alerts, each with a matching flag."""
+    from sqlalchemy import event
+    from app.services.ctf_service import generate_random_alerts
+    generate_random_alerts(1)  # Create the current round first
+    statements = []
+    count = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", count)
+    uuids = generate_random_alerts(3)
+    event.remove(db.engine, "before_cursor_execute", count)
+    assert len(statements) == 2  # One INSERT per table, no refresh SELECTs after the commit
+    assert len(uuids) == 3
+    assert Alert.query.count() == 4
+    for u in uuids:
+        assert db.session.get(Flag, u) is not None
+
+def test_start_ctf_creates_max_alerts(client):
+    """Test: POST /start_ctf fills the dashboard up to MAX_ALERTS_ON_START alerts."""
+    from app.constants import MAX_ALERTS_ON_START
+    rv = client.post("/start_ctf")
+    assert rv.status_code == 302
+    assert Alert.query.count() == MAX_ALERTS_ON_START
+
+def test_solved_alert_leaves_active_set(client):
+    """Test: an alert solved after wrong guesses is no longer counted as active."""
+    client.application.config["MAX_ALERTS"] = 0  # Don't respawn, so the count is easy to check
+    new = client.post("/alerts/create").get_json()["uuid"]
+    client.post("/submit_flag", data={"uuid": new, "flag": "WRONG"})
+    assert Alert.active().count() == 1
+
+    correct = db.session.get(Flag, new).value
+    client.post("/submit_flag", data={"uuid": new, "flag": correct})
+    assert Alert.active().count() == 0
+    assert db.session.get(Alert, new).solved_at is not None
+
+def test_submit_flag_uses_flag_cache(client):
+    """Test: flags of newly generated alerts are verified from the in-process cache."""
+    from app.services.flag_cache import flag_cache
+    new = client.post("/alerts/create").get_json()["uuid"]
+    assert flag_cache.get(new) is not None
+
+    hits = flag_cache.hits
+    rv = client.post("/submit_flag", json={"uuid": new, "flag": "WRONG"})
+    assert rv.get_json()["success"] is False
+    assert flag_cache.hits == hits + 1
+
+    client.post("/reset_ctf")
+    assert flag_cache.get(new) is None
+
+def test_flags_encrypted_and_resolved_by_digest(client):
+    """Test: flags are stored as digest + ciphertext, and a flag alone resolves its alert."""
+    from app.services.flag_cache import flag_cache
+    client.application.config["MAX_ALERTS"] = 0
+    new = client.post("/alerts/create").get_json()["uuid"]
+    correct = db.session.get(Flag, new).value
+    assert correct.startswith("FLAG{") and new not in correct
+    raw = db.session.execute(Flag.__table__.select().where(Flag.__table__.c.uuid == new)).mappings().one()
+    assert correct not in raw.values() and raw["digest"]  # Plaintext never hits the database
+
+    rv = client.post("/submit_flag", json={"flag": "FLAG{nope}"})
+    assert rv.get_json()["success"] is False
+    flag_cache.clear()  # Force the indexed digest lookup
+    rv = client.post("/submit_flag", json={"flag": correct, "player": "alice"})
+    assert rv.get_json()["success"] is True and rv.get_json()["uuid"] == new
+    assert Submission.query.filter_by(alert_uuid=new, completed=True).count() == 1
+    other = client.post("/alerts/create").get_json()["uuid"]
+    other_flag = db.session.get(Flag, other).value
+    assert client.post("/submit_flag/batch", json=[{"uuid": other, "flag": other_flag}]).get_json()["solved"] == 1
+    stored = db.session.execute(Submission.__table__.select().where(Submission.__table__.c.completed == True)).mappings().all()
+    assert len(stored) == 2 and not any(value in row.values() for value in (correct, other_flag) for row in stored)
+
+def test_default_flag_key_refused_outside_debug(tmp_path):
+    """Test: the app won't start in production with flags keyed by the public default secret."""
+    from app.config import Config, DEFAULT_SECRET_KEY
+    attrs = {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'prod.db'}", "SECRET_KEY": DEFAULT_SECRET_KEY,
+             "FLAG_SECRET_KEY": None}
+    with pytest.raises(RuntimeError, match="default key"):
+        create_app(type("ProdConfig", (Config,), attrs))
+    create_app(type("ProdConfig", (Config,), dict(attrs, FLAG_SECRET_KEY="a-real-deployment-key")))
+
+def test_batch_flag_submission(client):
+    """Test: a batch (JSON array or NDJSON) is verified in one pass and recorded together."""
+    import json
+    from app.services.flag_cache import flag_cache
+    from app.services.scoreboard import scoreboard
+    client.application.config["MAX_ALERTS"] = 0
+    first, second, third = (client.post("/alerts/create").get_json()["uuid"] for _ in range(3))
+    flag_cache.clear()  # Resolve through the bulk query
+    batch = [
+        {"uuid": first, "flag": db.session.get(Flag, first).value, "player": "alice"},
+        {"uuid": second, "flag": "WRONG", "player": "alice"},
+        {"flag": db.session.get(Flag, second).value},
+        {"uuid": "no-such-alert", "flag": "WRONG"},
+    ]
+    body = client.post("/submit_flag/batch?player=bob", json=batch).get_json()
+    assert [r["status"] for r in body["results"]] == ["correct", "incorrect", "correct", "not_found"]
+    assert body["results"][2]["uuid"] == second and body["solved"] == 2
+    assert Submission.query.count() == 3
+    assert {p["player"] for p in scoreboard.top(10)} == {"alice", "bob"}
+    assert Alert.active().count() == 1
+
+    ndjson = "\n".join(json.dumps(item) for item in [{"uuid": third, "flag": db.session.get(Flag, third).value}])
+    rv = client.post("/submit_flag/batch", data=ndjson, content_type="application/x-ndjson")
+    assert rv.get_json()["results"][0]["status"] == "correct"
+    assert client.post("/submit_flag/batch", data="{not json").status_code == 400
+
+def test_batch_duplicates_score_once(client):
+    """Test: repeats of a solved alert, in one batch or after an earlier solve, are already_solved and score nothing."""
+    from app.services.scoreboard import scoreboard
+    client.application.config["MAX_ALERTS"] = 0
+    first, second = (client.post("/alerts/create").get_json()["uuid"] for _ in range(2))
+    flags = {u: db.session.get(Flag, u).value for u in (first, second)}
+    client.post("/submit_flag", json={"uuid": second, "flag": flags[second], "player": "alice"})
+    points = scoreboard.entry("alice")["points"]
+
+    batch = [{"uuid": first, "flag": flags[first]}, {"uuid": first, "flag": flags[first]},
+             {"flag": flags[first]}, {"uuid": second, "flag": flags[second]}]
+    body = client.post("/submit_flag/batch?player=alice", json=batch).get_json()
+    assert [r["status"] for r in body["results"]] == ["correct", "already_solved", "already_solved", "already_solved"]
+    assert body["solved"] == 1 and scoreboard.entry("alice")["points"] == points + body["score"]
+    assert Submission.query.filter_by(completed=True).count() == 2
+
+def test_submission_rollups_and_backfill(client):
+    """Test: submissions update per-minute rollups, and the backfill command rebuilds the same numbers."""
+    client.application.config["MAX_ALERTS"] = 0
+    new = client.post("/alerts/create").get_json()["uuid"]
+    event_type = db.session.get(Alert, new).event_type
+    client.post("/submit_flag", json={"uuid": new, "flag": "WRONG"})
+    client.post("/submit_flag", json={"uuid": new, "flag": db.session.get(Flag, new).value})
+
+    points = client.get(f"/analytics/rollups?key={event_type}").get_json()["points"]
+    assert sum(p["attempts"] for p in points) == 2 and sum(p["solves"] for p in points) == 1
+    assert any(p["avg_elapsed"] is not None for p in points)
+    by_alert = client.get("/analytics/rollups?by=alert").get_json()["points"]
+    assert {p["alert"] for p in by_alert} == {new} and sum(p["attempts"] for p in by_alert) == 2
+    assert client.get("/analytics/rollups?from=2999-01-01T00:00:00Z").get_json()["points"] == []
+
+    result = client.application.test_cli_runner().invoke(args=["backfill-rollups"])
+    assert "Rolled up 2 submissions" in result.output
+    assert client.get(f"/analytics/rollups?key={event_type}").get_json()["points"] == points
+
+def test_wrong_guesses_are_batched(client):
+    """Test: wrong guesses are queued and written together with the next correct submission."""
+    from app.services.submission_queue import submission_queue
+    client.application.config["MAX_ALERTS"] = 0
+    new = client.post("/alerts/create").get_json()["uuid"]
+    client.post("/submit_flag", json={"uuid": new, "flag": "WRONG1"})
+    client.post("/submit_flag", json={"uuid": new, "flag": "WRONG2"})
+    assert submission_queue.depth == 2
+    assert Submission.query.count() == 0
+
+    correct = db.session.get(Flag, new).value
+    client.post("/submit_flag", json={"uuid": new, "flag": correct})
+    assert submission_queue.depth == 0
+    assert Submission.query.count() == 3
+
+    stats = client.get("/submissions/queue").get_json()
+    assert stats["flushed_rows"] == 2 and stats["flush_count"] == 1
+
+def test_failing_queued_rows_are_dropped_after_retries(client):
+    """Test: a row that can never be inserted is retried a few times, then dropped without losing the others."""
+    from datetime import datetime
+    new = client.post("/alerts/create").get_json()["uuid"]
+    good = dict(alert_uuid=new, player="p", submitted_value="WRONG", score=0, completed=False, timestamp=datetime.utcnow())
+    submission_queue.enqueue(**good)
+    submission_queue.enqueue(**dict(good, score=None))  # Violates NOT NULL
+    for _ in range(submission_queue.max_retries):
+        assert submission_queue.flush() == 0
+        assert submission_queue.depth == 2
+    assert submission_queue.flush() == 1  # Retried row by row: the good one is written
+    assert submission_queue.depth == 0 and submission_queue.dropped_rows == 1
+    assert Submission.query.count() == 1
+
+def test_alert_deltas_are_versioned(client):
+    """Test: alert changes are pushed as versioned 'alerts_delta' events with rendered rows."""
+    from app import socketio
+    sio = socketio.test_client(client.application)
+    new = client.post("/alerts/create").get_json()["uuid"]
+    correct = db.session.get(Flag, new).value
+    client.post("/submit_flag", json={"uuid": new, "flag": correct})
+
+    deltas = [m["args"][0] for m in sio.get_received() if m["name"] == "alerts_delta"]
+    assert [d["version"] for d in deltas] == [deltas[0]["version"], deltas[0]["version"] + 1]
+    assert deltas[0]["added"][0]["uuid"] == new
+    assert new in deltas[0]["added"][0]["html"]
+    assert deltas[1]["solved"] == [new]
+
+    snapshot = client.get("/alerts/active").get_json()
+    assert snapshot["version"] == deltas[1]["version"]
+    assert all(row["uuid"] != new for row in snapshot["alerts"])
+    sio.disconnect()
+
+def test_list_alerts_pagination_etag_and_ndjson(client):
+    """Test: /alerts/list pages by cursor, honours If-None-Match, and streams NDJSON."""
+    import json
+    client.post("/start_ctf")
+    uuids = {a.uuid for a in Alert.query.all()}
+
+    # Walk all pages two at a time
+    seen, cursor = [], None
+    while True:
+        rv = client.get("/alerts/list", query_string={"limit": 2, **({"after": cursor} if cursor else {})})
+        seen += [a["uuid"] for a in rv.get_json()]
+        cursor = rv.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == len(uuids) and set(seen) == uuids
+
+    # Unchanged data -> 304, new alert -> fresh ETag
+    rv = client.get("/alerts/list")
+    assert client.get("/alerts/list", headers={"If-None-Match": rv.headers["ETag"]}).status_code == 304
+    client.post("/submit_flag", json={"uuid": seen[0], "flag": db.session.get(Flag, seen[0]).value})
+    assert client.get("/alerts/list", headers={"If-None-Match": rv.headers["ETag"]}).status_code == 200
+
+    rv = client.get("/alerts/list?format=ndjson")
+    assert rv.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in rv.data.decode().splitlines()]
+    assert len(lines) == Alert.query.count()
+
+    assert client.get("/alerts/list?after=not-a-cursor").status_code == 400
+
+def test_scoreboard_tracks_correct_submissions(client):
+    """Test: correct submissions update the in-memory scoreboard, which matches a DB rebuild."""
+    from app.services.scoreboard import scoreboard
+    client.application.config["MAX_ALERTS"] = 0
+    first = client.post("/alerts/create").get_json()["uuid"]
+    second = client.post("/alerts/create").get_json()["uuid"]
+    client.post("/submit_flag", json={"uuid": first, "flag": db.session.get(Flag, first).value, "player": "alice"})
+    client.post("/submit_flag", json={"uuid": second, "flag": db.session.get(Flag, second).value, "player": "bob"})
+    client.post("/submit_flag", json={"uuid": second, "flag": "WRONG", "player": "carol"})
+
+    board = client.get("/scoreboard?player=bob").get_json()
+    assert board["players"] == 2
+    assert [row["player"] for row in board["top"]] == sorted(["alice", "bob"], key=lambda p: (-scoreboard.entry(p)["points"], p))
+    assert board["player"]["solves"] == 1
+
+    live = scoreboard.top()
+    scoreboard.rebuild()
+    assert scoreboard.top() == live
+
+def test_resubmitting_a_solved_flag_scores_nothing(client):
+    """Test: only the first correct answer for an alert scores; resubmits (by uuid or flag-only) don't."""
+    from datetime import datetime
+    from app.services.scoreboard import scoreboard
+    client.application.config["MAX_ALERTS"] = 0
+    new = client.post("/alerts/create").get_json()["uuid"]
+    correct = db.session.get(Flag, new).value
+    assert client.post("/submit_flag", json={"uuid": new, "flag": correct, "player": "alice"}).get_json()["success"]
+    points = scoreboard.entry("alice")["points"]
+
+    for _ in range(3):
+        rv = client.post("/submit_flag", json={"uuid": new, "flag": correct, "player": "alice"}).get_json()
+        assert rv["success"] is False and rv["already_solved"] and rv["score"] == 0
+        client.post("/submit_flag", json={"flag": correct, "player": "alice"})
+    assert scoreboard.entry("alice")["points"] == points
+    assert Submission.query.filter_by(alert_uuid=new, completed=True).count() == 1
+
+    # Duplicate completed rows already in the database don't inflate a rebuilt board either
+    db.session.add(Submission(alert_uuid=new, round_id=db.session.get(Alert, new).round_id, player="alice",
+                              submitted_value=correct, score=points, completed=True, timestamp=datetime.utcnow()))
+    db.session.commit()
+    scoreboard.rebuild()
+    assert scoreboard.entry("alice") == {**scoreboard.entry("alice"), "points": points, "solves": 1}
+
+def test_non_string_json_fields_are_accepted(client):
+    """Test: numeric player/flag values are treated as text instead of crashing the submit routes."""
+    from app.services.scoreboard import scoreboard
+    client.application.config["MAX_ALERTS"] = 0
+    new = client.post("/alerts/create").get_json()["uuid"]
+    assert client.post("/submit_flag", json={"uuid": new, "flag": 7, "player": 7}).get_json()["success"] is False
+    correct = db.session.get(Flag, new).value
+    assert client.post("/submit_flag", json={"uuid": new, "flag": correct, "player": 7}).get_json()["success"]
+    assert scoreboard.entry("7") is not None
+    body = client.post("/submit_flag/batch", json=[{"flag": 1, "player": 2.5}, {"flag": "x", "player": ["a"]}]).get_json()
+    assert [r["status"] for r in body["results"]] == ["incorrect", "incorrect"]
+    assert client.post("/submit_flag", json=["not", "an", "object"]).status_code == 400
+
+def test_submit_flag_rate_limited(client):
+    """Test: bursts of guesses beyond the per-client bucket get 429 before touching the DB."""
+    from app.services.rate_limit import submit_limiter, TokenBucketLimiter
+    client.application.config.update(SUBMIT_BURST_PER_CLIENT=2, SUBMIT_RATE_PER_CLIENT=0.01)
+    submit_limiter.init_app(client.application)
+
+    new = client.post("/alerts/create").get_json()["uuid"]
+    codes = [client.post("/submit_flag", json={"uuid": new, "flag": "WRONG"}).status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+    assert submission_queue.depth == 2  # The rejected guess was never recorded
+
+    # Idle buckets expire so memory stays bounded
+    limiter = TokenBucketLimiter(rate=1, burst=1, idle_ttl=10)
+    limiter.acquire("a", now=0)
+    assert limiter.acquire("a", now=0.5) > 0
+    limiter.acquire("b", now=20)
+    assert len(limiter) == 1
+
+def test_benchmark_suite_smoke():
+    """Test: the benchmark suite runs end-to-end on a tiny dataset and reports latency stats."""
+    from benchmarks.bench_app import run_benchmarks
+    report = run_benchmarks(alerts=3, submissions=10, iterations=2)
+    names = {r["name"] for r in report["results"]}
+    assert {"GET /", "POST /submit_flag (wrong)", "create_fake_flag_challenge",
+            "create_fake_flag_challenge (no-op rebuild)"} <= names
+    assert all("p50_ms" in r and "p99_ms" in r for r in report["results"])
+
+def test_metrics_endpoint(client):
+    """Test: /metrics reports request latency, SQL counts and challenge build stats."""
+    client.post("/alerts/create")
+    client.get("/")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'ctf_request_duration_seconds_count{endpoint="ctf.dashboard"} 1' in body
+    assert 'ctf_request_sql_queries_bucket{endpoint="alerts.create_alert",le="+Inf"} 1' in body
+    assert "ctf_challenge_bytes_written_total" in body
+    assert "ctf_submission_queue_depth 0" in body
+
+def test_unix_socket_broker_relays_cluster_events(client):
+    """Test: the built-in unix:// broker carries cluster events and alert versions between workers."""
+    import tempfile
+    from app.services import alert_events, rounds
+    from app.services.cluster import UnixSocketManager, CLUSTER_NAMESPACE
+    from app.services.scoreboard import scoreboard
+
+    directory = tempfile.mkdtemp(prefix="sio")  # Short path: AF_UNIX socket paths are length-limited
+    worker_a = UnixSocketManager(f"unix://{directory}", channel="test")
+    worker_b = UnixSocketManager(f"unix://{directory}", channel="test")
+    try:
+        round_id = rounds.current_round_id()
+        relayed = {"method": "emit", "event": "scoreboard_record", "namespace": CLUSTER_NAMESPACE,
+                   "data": [{"player": "zoe", "points": 7, "round": round_id}], "host_id": worker_a.host_id}
+        worker_a._publish(relayed)
+        worker_b._handle_emit(next(worker_b._listen()))  # Board not loaded here: nothing to update, no DB access
+        assert round_id not in scoreboard._boards
+
+        scoreboard.top()  # Board loaded, so relayed solves are applied incrementally
+        worker_a._publish(relayed)
+        worker_b._handle_emit(next(worker_b._listen()))
+        assert scoreboard.entry("zoe")["points"] == 7
+
+        version = alert_events.current_version() + 5
+        worker_a._publish({"method": "emit", "event": "alerts_delta", "namespace": "/", "room": None,
+                           "data": [{"version": version}], "host_id": worker_a.host_id})
+        worker_b._handle_emit(next(worker_b._listen()))
+        assert alert_events.current_version() == version
+    finally:
+        worker_a.close()
+        worker_b.close()
+        scoreboard.clear()
+
+def test_challenge_files_are_deduplicated(client):
+    """Test: hint-only files are hardlinked from the blob store; only the flag file is unique."""
+    from pathlib import Path
+    from app.services.blob_store import dedup_stats
+    from app.services.ctf_service import create_fake_flag_challenge, get_challenge_base_dir
+    dedup_stats.reset()
+    alert_data = {"event_type": "Failed Login", "user": "eve", "ip": "10.0.0.12"}
+    for i in range(40):
+        create_fake_flag_challenge(alert_data, f"dedup{i}")
+
+    files = list(Path(get_challenge_base_dir(), "Alert_dedup0").rglob("*.txt"))
+    flag_files = [f for f in files if "FLAG{eve_10.0.0.12_" in f.read_text()]
+    assert len(files) == 15 and len(flag_files) == 1
+    assert flag_files[0].stat().st_nlink == 1
+    assert all(f.stat().st_nlink >= 2 for f in files if f not in flag_files)  # Blob + this tree
+    assert dedup_stats.ratio > 1
+
+def test_challenge_gc_removes_orphaned_trees(client):
+    """Test: the collector removes trees with no Alert row (dry-run only reports them)."""
+    from app.services.ctf_service import get_challenge_base_dir
+    from app.services.challenge_jobs import challenge_jobs
+    live = client.post("/alerts/create").get_json()["uuid"]
+    challenge_jobs.join()
+    orphan = get_challenge_base_dir() / "Alert_00000000-0000-4000-8000-000000000000"
+    (orphan / "auth_logs").mkdir(parents=True)
+    (orphan / "auth_logs" / "log.txt").write_text("stale")
+
+    report = client.post("/alerts/gc?dry_run=1").get_json()
+    assert report["orphaned"] == 1 and orphan.exists()
+
+    report = client.post("/alerts/gc?dry_run=0").get_json()
+    assert report["orphaned"] == 1 and not orphan.exists()
+    assert (tree_of(live)).exists()
+    assert client.get("/alerts/gc").get_json()["runs"] == 2
+
+def test_challenge_gc_enforces_budget_oldest_solved_first(client):
+    """Test: over the inode budget, solved trees are evicted while active ones stay."""
+    from app.services.challenge_gc import challenge_gc
+    from app.services.challenge_jobs import challenge_jobs
+    from app.services.ctf_service import get_challenge_base_dir
+    client.application.config["MAX_ALERTS"] = 0
+    solved = client.post("/alerts/create").get_json()["uuid"]
+    active = client.post("/alerts/create").get_json()["uuid"]
+    client.post("/submit_flag", json={"uuid": solved, "flag": db.session.get(Flag, solved).value})
+    challenge_jobs.join()
+
+    challenge_gc.max_inodes = 1
+    try:
+        report = challenge_gc.collect(dry_run=False)
+    finally:
+        challenge_gc.max_inodes = None
+    assert report["evicted"] == 1
+    assert not (tree_of(solved)).exists()
+    assert (tree_of(active)).exists()
+
+def test_bundle_download_zip_and_tar(client):
+    """Test: /alerts/<uuid>/bundle streams the challenge tree with exactly one flag file."""
+    import io, tarfile, zipfile
+    new = client.post("/alerts/create").get_json()["uuid"]
+    flag = db.session.get(Flag, new).value
+
+    assert client.get(f"/alerts/{new}/bundle").mimetype == "application/x-tar"  # Constant-memory default
+    rv = client.get(f"/alerts/{new}/bundle?format=zip")
+    assert rv.mimetype == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(rv.data)) as zf:
+        names = zf.namelist()
+        assert len(names) == 15 and all(n.startswith(f"Alert_{new}/") for n in names)
+        assert sum(flag in zf.read(n).decode() for n in names) == 1
+        assert zf.testzip() is None  # Every CRC checks out
+
+    rv = client.get(f"/alerts/{new}/bundle?format=tar.gz")
+    with tarfile.open(fileobj=io.BytesIO(rv.data), mode="r:gz") as tar:
+        members = [m for m in tar.getmembers() if m.isfile()]
+        assert len(members) == 15
+        assert sum(flag in tar.extractfile(m).read().decode() for m in members) == 1
+
+    assert client.get(f"/alerts/{new}/bundle?format=rar").status_code == 400
+
+def test_alert_routes_are_scoped_to_the_session_round(client):
+    """Test: per-alert routes 404 for other events, ended rounds and unpublished warm-pool alerts."""
+    from app.services.warm_pool import warm_pool
+    client.application.config["MAX_ALERTS"] = 0
+    new = client.post("/alerts/create").get_json()["uuid"]
+    client.post("/submit_flag", json={"uuid": new, "flag": db.session.get(Flag, new).value})
+    routes = [("get", f"/alerts/{new}/bundle"), ("get", f"/alerts/{new}/status"), ("post", f"/alerts/{new}/trigger")]
+    assert all(getattr(client, method)(url).status_code in (200, 204) for method, url in routes)
+    assert client.get(f"/flag_complete/{new}").status_code == 200
+
+    other = client.application.test_client()
+    other.get("/?event=other")  # Remembered in that client's session
+    assert all(getattr(other, method)(url).status_code == 404 for method, url in routes)
+    assert other.get(f"/flag_complete/{new}").status_code == 302
+
+    client.post("/reset_ctf")  # Ends the round
+    assert client.get(f"/alerts/{new}/bundle").status_code == 404
+    assert client.get(f"/flag_complete/{new}").status_code == 302
+
+    warm_pool.size = 1
+    warm_pool.refill()
+    pooled = Alert.query.filter_by(published=False).first().uuid
+    assert client.get(f"/alerts/{pooled}/bundle").status_code == 404
+
+def test_tree_generator_spec_decoys_and_pooled_writes(client, tmp_path):
+    """Test: a nested spec yields its exact file count with one flag and the decoys, written by the thread pool."""
+    from app.services.ctf_service import create_fake_flag_challenge, iter_challenge_files
+    from app.services.tree_gen import TreeSpec
+    spec = TreeSpec(depth=2, fanout=3, files_per_dir=2, decoys=2, min_size=200, max_size=400)
+    alert_data = {"event_type": "Account Lockout", "user": "bob", "ip": "10.0.0.12"}
+    files = list(iter_challenge_files(alert_data, "deep1", spec))
+    assert len(files) == len({p for p, _, _ in files}) == spec.file_count == 24
+    assert sum(is_flag for _, _, is_flag in files) == 1
+    assert sum("FLAG{" in body for _, body, is_flag in files if not is_flag) == 2
+    assert all(len(body) >= 200 for _, body, _ in files)
+    assert files == list(iter_challenge_files(alert_data, "deep1", spec))  # Reproducible
+
+    client.application.config.update(CHALLENGE_WRITE_THREADS=4, CHALLENGE_WRITE_POOL_MIN_FILES=1)  # Use the writer threads
+    tree = tmp_path / "deep"
+    assert create_fake_flag_challenge(alert_data, "deep1", tree=tree, spec=spec) == {"written": 24, "unchanged": 0}
+    assert len(list(tree.rglob("*.txt"))) == 24
+    assert create_fake_flag_challenge(alert_data, "deep1", tree=tree, spec=spec) == {"written": 0, "unchanged": 24}
+
+    # The manifest is streamed in generation order, so a rebuild checks it entry by entry
+    from app.services.manifest import iter_manifest
+    assert [p for p, _ in iter_manifest(tree)] == [p for p, _, _ in files]
+    (tree / files[5][0]).unlink()
+    assert create_fake_flag_challenge(alert_data, "deep1", tree=tree, spec=spec) == {"written": 1, "unchanged": 23}
+    smaller = TreeSpec(depth=1, fanout=3, files_per_dir=2)
+    create_fake_flag_challenge(alert_data, "deep1", tree=tree, spec=smaller)
+    assert len(list(iter_manifest(tree))) == 6  # Leftover entries of the bigger tree are dropped
+
+def test_builds_run_in_os_threads_under_eventlet(client, monkeypatch):
+    """Test: with monkey-patched threads, a build runs in an eventlet.tpool OS thread so it can't block the hub."""
+    import threading
+    from app.services import challenge_jobs, ctf_service
+    monkeypatch.setattr(challenge_jobs, "green_threads", lambda: True)
+    build, threads = ctf_service.create_fake_flag_challenge, []
+
+    def recording_build(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return build(*args, **kwargs)
+    monkeypatch.setattr(ctf_service, "create_fake_flag_challenge", recording_build)
+    alert_data = {"event_type": "Failed Login", "user": "eve", "ip": "10.0.0.12"}
+    assert challenge_jobs.build_challenge(alert_data, "os1") == {"written": 15, "unchanged": 0}
+    assert threads and threads[0] != threading.get_ident()
+
+def test_trigger_rewrites_only_missing_files(client):
+    """Test: generation is seeded by a keyed hash of the UUID, and re-triggering only rewrites missing/changed files."""
+    from app.services import flag_crypto
+    from app.services.challenge_jobs import challenge_jobs
+    from app.services.ctf_service import (challenge_seed, create_fake_flag_challenge, get_challenge_base_dir,
+                                          iter_challenge_files)
+    new = client.post("/alerts/create").get_json()["uuid"]
+    challenge_jobs.join()
+    alert = db.session.get(Alert, new)
+    alert_data = {"event_type": alert.event_type, "user": alert.user, "ip": alert.ip}
+    tree = tree_of(new)
+
+    # Same UUID -> same files as on disk
+    for rel_path, body, _ in iter_challenge_files(alert_data, new):
+        assert (tree / rel_path).read_text() == body
+
+    assert create_fake_flag_challenge(alert_data, new, tree=tree) == {"written": 0, "unchanged": 15}
+
+    # The seed needs the flag key: the public UUID alone doesn't reveal where the flag is
+    seed = challenge_seed(new)
+    assert new.replace("-", "") not in seed
+    client.application.config["FLAG_SECRET_KEY"] = "another-deployment-key"
+    flag_crypto.init_app(client.application)
+    assert challenge_seed(new) != seed
+    client.application.config["FLAG_SECRET_KEY"] = None
+    flag_crypto.init_app(client.application)
+
+    (tree / "auth_logs" / "log.txt").unlink()
+    assert client.post(f"/alerts/{new}/trigger").status_code == 204
+    assert (tree / "auth_logs" / "log.txt").exists()
+    assert create_fake_flag_challenge(alert_data, new, tree=tree) == {"written": 0, "unchanged": 15}
+
+def test_challenge_builds_run_in_background(client):
+    """Test: /alerts/create only inserts; the tree is built by the job pool, then reported ready."""
+    from app import socketio
+    from app.services.challenge_jobs import challenge_jobs
+    from app.services.ctf_service import get_challenge_base_dir
+    sio = socketio.test_client(client.application)
+    elsewhere = socketio.test_client(client.application, query_string="event=other")
+    new = client.post("/alerts/create").get_json()["uuid"]
+    assert client.get(f"/alerts/{new}/status").get_json()["status"] == "pending"
+    assert not (tree_of(new)).exists()
+
+    assert challenge_jobs.join(timeout=5)
+    assert client.get(f"/alerts/{new}/status").get_json()["status"] == "ready"
+    assert len(list((tree_of(new)).rglob("*.txt"))) == 15
+    assert {"uuid": new} in [e["args"][0] for e in sio.get_received() if e["name"] == "alert_ready"]
+    assert not [e for e in elsewhere.get_received() if e["name"] == "alert_ready"]  # Only the alert's event is told
+    assert client.get("/alerts/jobs").get_json()["completed"] >= 1  # Warm pool refills may also have run
+
+def test_warm_pool_publishes_prebuilt_alerts(client):
+    """Test: round start publishes pooled alerts by flipping the row and renaming the built tree."""
+    from app.constants import MAX_ALERTS_ON_START
+    from app.services.challenge_jobs import challenge_jobs
+    from app.services.ctf_service import get_challenge_base_dir, warm_tree
+    from app.services.warm_pool import warm_pool
+    warm_pool.size = 3
+    assert warm_pool.refill() == 3
+    challenge_jobs.join()
+    pooled = [a.uuid for a in Alert.query.filter_by(published=False)]
+    assert Alert.active().count() == 0
+    assert client.post("/submit_flag", json={"uuid": pooled[0], "flag": db.session.get(Flag, pooled[0]).value}).status_code == 404
+
+    client.post("/start_ctf")
+    active = {a.uuid for a in Alert.active()}
+    assert len(active) == MAX_ALERTS_ON_START and set(pooled) <= active
+    assert warm_pool.stats()["hits"] == 3 and warm_pool.stats()["misses"] == MAX_ALERTS_ON_START - 3
+    for u in pooled:
+        assert (tree_of(u) / "auth_logs" / "log.txt").exists()
+        assert not warm_tree(u).exists()
+    rv = client.post("/submit_flag", json={"uuid": pooled[0], "flag": db.session.get(Flag, pooled[0]).value})
+    assert rv.get_json()["score"] >= 990  # Scored from publish time, not pool time
+
+def test_dashboard_render_cache_skips_db_between_changes(client):
+    """Test: GET / is served from the versioned table cache until the alert set changes."""
+    from sqlalchemy import event
+    from app.services.challenge_jobs import challenge_jobs
+    from app.services.render_cache import alert_table_cache
+    new = client.post("/alerts/create").get_json()["uuid"]
+    challenge_jobs.join()
+    assert client.get("/").headers["X-Render-Cache"] == "miss"
+
+    queries = []
+    listener = lambda *args: queries.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        rv = client.get("/")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert rv.headers["X-Render-Cache"] == "hit" and new.encode() in rv.data
+    assert queries == []
+
+    second = client.post("/alerts/create").get_json()["uuid"]  # New version -> re-render
+    rv = client.get("/")
+    assert rv.headers["X-Render-Cache"] == "miss" and second.encode() in rv.data
+    assert alert_table_cache.stats()["hits"] == 1 and alert_table_cache.stats()["misses"] == 2
+
+def test_events_run_separate_rounds_and_reset_archives(client):
+    """Test: each event has its own round; reset starts a new round without deleting the old rows."""
+    from app.services.challenge_gc import challenge_gc
+    from app.services.challenge_jobs import challenge_jobs
+    client.application.config["MAX_ALERTS"] = 0
+    other = client.application.test_client()
+    mine = client.post("/alerts/create?event=classA").get_json()["uuid"]
+    theirs = other.post("/alerts/create?event=classB").get_json()["uuid"]
+    challenge_jobs.join()
+    assert [a["uuid"] for a in client.get("/alerts/list").get_json()] == [mine]  # Event remembered in the session
+    assert client.post("/submit_flag", json={"uuid": theirs, "flag": db.session.get(Flag, theirs).value}).status_code == 404
+
+    old_round = client.get("/rounds").get_json()["current"]
+    client.post("/reset_ctf")
+    listing = client.get("/rounds").get_json()
+    assert listing["event"] == "classA" and listing["current"] != old_round
+    assert listing["rounds"][1]["ended_at"] is not None
+    assert mine not in [a["uuid"] for a in client.get("/alerts/list").get_json()]
+    assert db.session.get(Alert, mine) is not None  # Archived, not deleted
+    assert client.post("/submit_flag", json={"uuid": mine, "flag": db.session.get(Flag, mine).value}).status_code == 404
+
+    # The other event is untouched; the archived round's tree goes on the next collection
+    assert [a["uuid"] for a in other.get("/alerts/list").get_json()] == [theirs]
+    archived = tree_of(mine)
+    challenge_jobs.join()
+    assert challenge_gc.collect(dry_run=False)["archived"] == 1
+    assert not archived.exists() and tree_of(theirs).exists()
+
+def test_sqlite_production_profile(client):
+    """Test: the default 'production' SQLite profile turns on WAL and the tuned pragmas."""
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    assert db.engine.pool.size() == 10